@@ -4,6 +4,8 @@ from datetime import datetime, date
 from flask.json.provider import DefaultJSONProvider
 from cassandra.util import Date
 from neo4j.time import DateTime as Neo4jDateTime   
+from bson import ObjectId
+from bson.decimal128 import Decimal128
 import uuid
 from neo4j import GraphDatabase
 from pathlib import Path
@@ -25,7 +27,13 @@ from backend.app.routes.analytics_clickhouse import analytics_ch_bp
 
 
 
-from backend.graph_db.mongo_to_neo_importer import MongoToNeoImporter
+from backend.app.extensions import db, redis, neo4, clickhouse, reco
+from backend.app.config import (
+    INVENTORY_MODE, INVENTORY_FLUSH_INTERVAL, OUTBOX_POLL_INTERVAL, OUTBOX_MAX_ATTEMPTS,
+    RECO_INVALIDATE_CO_BUYERS,
+)
+from backend.app.utils.inventory import InventoryFlusher
+from backend.app.utils.outbox import OutboxWorker, build_handlers
 
 
 class CustomJSONProvider(DefaultJSONProvider):
@@ -43,6 +51,12 @@ class CustomJSONProvider(DefaultJSONProvider):
         if isinstance(obj, uuid.UUID):
             return str(obj)
 
+        # Mongo tipai, kurie dabar grįžta iš Redis cache nepakitę
+        if isinstance(obj, ObjectId):
+            return str(obj)
+        if isinstance(obj, Decimal128):
+            return float(obj.to_decimal())
+
         return super().default(obj)
 
     
@@ -71,9 +85,31 @@ def create_app():
     app.register_blueprint(analytics_ch_bp) 
 
     
-    # Importuojam iš Mongo → Neo4j serveriui startuojant
-    mongo_importer = MongoToNeoImporter()
-    mongo_importer.run()
+    # Redis likučių režime pokyčius į Mongo perkeliam fone
+    if INVENTORY_MODE == "redis":
+        InventoryFlusher(db, redis, interval=INVENTORY_FLUSH_INTERVAL).start()
+
+    # Versijuota ClickHouse likučių lentelė (jei dar nėra)
+    clickhouse.ensure_schema()
+
+    # Neo4j / ClickHouse sinchronizacija iš Outbox kolekcijos
+    OutboxWorker(
+        db,
+        build_handlers(neo4, clickhouse, redis, invalidate_co_buyers=RECO_INVALIDATE_CO_BUYERS),
+        interval=OUTBOX_POLL_INTERVAL,
+        max_attempts=OUTBOX_MAX_ATTEMPTS,
+    ).start()
+
+    # Neo4j constraint'ai / indeksai; trūkstamus parodom startuojant
+    neo4.ensure_schema()
+    neo4.verify_schema()
+
+    # Mongo → Neo4j sync čia nebeleidžiam (kiekvienas worker'is jį dubliuotų):
+    # atskiras procesas `python -m backend.graph_db.mongo_to_neo_importer --follow`
+
+    # In-process rekomendacijų matrica (RECO_ENGINE = "sparse") periodiškai perkraunama
+    if reco is not neo4:
+        reco.start()
     
     return app
 
@@ -1,4 +1,53 @@
 CART_TTL = 30  # 30 sec
 
 def cart_key(owner_id: str) -> str:
-    return f"cart:{owner_id}"
\ No newline at end of file
+    return f"cart:{owner_id}"
+
+# Parduodamų renginių sorted set: member = renginio id, score = renginio data (unix ts)
+VALID_EVENTS_KEY = "valid_events:by_date"
+
+# L1 (in-process) cache prieš Redis: įrašų skaičius ir TTL sekundėmis
+LOCAL_CACHE_SIZE = 1024
+LOCAL_CACHE_TTL = 5
+
+# Cache reikšmių formatas: "json", "orjson" arba "msgpack"; zstd virš slenksčio (baitais)
+REDIS_CODEC = "msgpack"
+REDIS_COMPRESS_THRESHOLD = 2048
+
+# Bilietų likučių šaltinis pirkimo metu: "mongo" (transakcija) arba "redis" (Lua + batch į Mongo)
+INVENTORY_MODE = "mongo"
+INVENTORY_FLUSH_INTERVAL = 1.0  # sek.
+
+# Outbox worker'is (Neo4j / ClickHouse sinchronizacija fone)
+OUTBOX_POLL_INTERVAL = 0.5  # sek.
+OUTBOX_MAX_ATTEMPTS = 8
+
+# Neo4j driver'is: jungčių pool'as, laukimo ir užklausų timeout'ai
+NEO4J_MAX_POOL_SIZE = 100
+NEO4J_ACQUISITION_TIMEOUT = 10.0  # sek., kiek laukti laisvos jungties
+NEO4J_QUERY_TIMEOUT = 15.0  # sek., None = serverio numatytasis
+NEO4J_MAX_RETRY_TIME = 15.0  # sek., managed transakcijų pakartojimai
+
+# Rekomendacijų cache (per vartotoją ir variantą)
+RECO_CACHE_TTL = 300  # 5 min
+RECO_VARIANTS = ("all", "upcoming", "organizers")
+# Po pirkimo invaliduoti ir kitų to paties renginio pirkėjų rekomendacijas
+RECO_INVALIDATE_CO_BUYERS = True
+
+def reco_key(user_id: str, variant: str) -> str:
+    return f"reco:{variant}:{user_id}"
+
+
+# Daugiausiai vartotojų viename /recommendations/batch užklausime ir rekomendacijų vienam vartotojui
+RECO_BATCH_MAX_USERS = 1000
+RECO_BATCH_MAX_LIMIT = 50
+
+# Rekomendacijų variklis: "neo4j" (Cypher per CO_BOUGHT) arba "sparse" (SciPy CSR atmintyje)
+RECO_ENGINE = "neo4j"
+RECO_SPARSE_REFRESH_INTERVAL = 300  # sek., kas kiek perkraunama pirkimų matrica
+
+# Cold-start (be pirkimų istorijos) vartotojams – bendras populiarių renginių sąrašas
+RECO_COLD_START_KEY = "reco:cold_start"
+RECO_COLD_START_TTL = 600  # 10 min
+# Per-vartotojo cache žymė "istorijos nėra" (cache_aside None nekešuoja)
+RECO_NO_HISTORY = {"no_history": True}
@@ -2,11 +2,39 @@ from backend.mongas.db import MongoDB
 from backend.redysas.ops import RedisClient
 from backend.casa.kasandre import CassandraRepository
 from backend.graph_db.graph import GraphDB
+from backend.graph_db import sparse_recommender
 from backend.clickhouse.clickhouse import ClickHouseClient
+from backend.app.config import (
+    LOCAL_CACHE_SIZE, LOCAL_CACHE_TTL, REDIS_CODEC, REDIS_COMPRESS_THRESHOLD,
+    NEO4J_MAX_POOL_SIZE, NEO4J_ACQUISITION_TIMEOUT, NEO4J_QUERY_TIMEOUT, NEO4J_MAX_RETRY_TIME,
+    RECO_ENGINE, RECO_SPARSE_REFRESH_INTERVAL,
+)
 
 # Initialize but don't connect yet
 db = MongoDB()
-redis = RedisClient()
+redis = RedisClient(
+    local_cache_size=LOCAL_CACHE_SIZE,
+    local_cache_ttl=LOCAL_CACHE_TTL,
+    codec=REDIS_CODEC,
+    compress_threshold=REDIS_COMPRESS_THRESHOLD,
+)
 cassandra = CassandraRepository()
-neo4 = GraphDB()
-clickhouse = ClickHouseClient()
\ No newline at end of file
+neo4 = GraphDB(
+    max_pool_size=NEO4J_MAX_POOL_SIZE,
+    acquisition_timeout=NEO4J_ACQUISITION_TIMEOUT,
+    query_timeout=NEO4J_QUERY_TIMEOUT,
+    max_retry_time=NEO4J_MAX_RETRY_TIME,
+)
+# Outbox užduotis ištrinama tik po sėkmingo insert'o, o klaida keliauja į retry;
+# async_insert sujungia smulkius insert'us serverio pusėje
+clickhouse = ClickHouseClient(async_insert=True)
+
+# Collaborative rekomendacijos: Neo4j arba in-process SciPy matrica (ta pati sąsaja)
+reco = neo4
+if RECO_ENGINE == "sparse":
+    if sparse_recommender.available():
+        reco = sparse_recommender.SparseRecommender(
+            db, refresh_interval=RECO_SPARSE_REFRESH_INTERVAL, fallback=neo4
+        )
+    else:
+        print("⚠️ scipy not installed, falling back to Neo4j recommendations")
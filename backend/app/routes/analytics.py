@@ -22,13 +22,15 @@ def vilnius_events():
 @analytics_bp.get("/top3-by-tickets")
 def top3_by_tickets():
     cache_key = "analytics:top3_events"
-    
-    # Try Redis cache first
-    cached = redis.get_cache(cache_key)
+
+    # Cache result for 1 minute (60 seconds); on expiry only one worker recomputes
+    doc, cached = redis.cache_aside(cache_key, compute_top3_by_tickets, ttl=60)
     if cached:
         print("Returning top3 events from Redis cache")
-        return cached
-    
+    return doc
+
+
+def compute_top3_by_tickets():
     print("Computing aggregation in MongoDB...")
     pipeline = [
         {"$unwind": {"path": "$Bilietai", "preserveNullAndEmptyArrays": False}},
@@ -68,9 +70,4 @@ def top3_by_tickets():
         {"$project": {"_id": 0, "count": 1, "data": 1}}
     ]
     
-    doc = next(db.uzsakymai.aggregate(pipeline), {"count": 0, "data": []})
-    
-    # Cache result for 1 minute (60 seconds)
-    redis.set_cache(cache_key, doc, ttl=60)
-    
-    return doc
\ No newline at end of file
+    return next(db.uzsakymai.aggregate(pipeline), {"count": 0, "data": []})
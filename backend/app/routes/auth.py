@@ -1,5 +1,6 @@
 from flask import Blueprint, jsonify, request
-from backend.app.extensions import db, neo4, clickhouse
+from backend.app.extensions import db
+from backend.app.utils import outbox
 from backend.app.utils.auth import verify_password, hash_password
 
 auth_bp = Blueprint('auth', __name__, url_prefix='/api/v1')
@@ -47,23 +48,22 @@ def register_user():
         "Slaptazodis": hashed_password,
     }
 
-    # STEP 1: Save to MongoDB
-    db.vartotojai.insert_one(user_doc)
-    
-    # STEP 2: Sync to Neo4j
-    neo4.add_user(
-        user_id=email,
-        vardas=user_doc.get("Vardas"),
-        pavarde=user_doc.get("Pavarde"),
-        miestas=user_doc.get("Miestas"),
-        pomegiai=user_doc.get("Pomegiai", [])
-    )
-    
-    # STEP 3: 📤 Sync to ClickHouse
-    try:
-        clickhouse.sync_user(user_doc)
-    except Exception as e:
-        print(f"⚠️ ClickHouse sync failed (non-critical): {e}")
+    # STEP 1: Save to MongoDB kartu su Neo4j / ClickHouse sinchronizacijos užduotimis
+    with db.client.start_session() as s:
+        with s.start_transaction():
+            db.vartotojai.insert_one(user_doc, session=s)
+            outbox.enqueue(db, [
+                (outbox.NEO4J_ADD_USER, {
+                    "user_id": email,
+                    "vardas": user_doc.get("Vardas"),
+                    "pavarde": user_doc.get("Pavarde"),
+                    "miestas": user_doc.get("Miestas"),
+                    "pomegiai": user_doc.get("Pomegiai", []),
+                }),
+                (outbox.CH_SYNC_USER, user_doc),
+            ], session=s)
+
+    # STEP 2: Neo4j ir ClickHouse atnaujina OutboxWorker fone
 
     public_user = {k: v for k, v in user_doc.items() if k != "Slaptazodis"}
     return jsonify({"ok": True, "user": public_user})
\ No newline at end of file
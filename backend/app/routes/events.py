@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
-from datetime import datetime
+from datetime import datetime, timezone
 from backend.app.extensions import db, redis
+from backend.app.config import VALID_EVENTS_KEY
 
 events_bp = Blueprint('events', __name__, url_prefix='/api/v1')
 
@@ -9,63 +10,53 @@ events_bp = Blueprint('events', __name__, url_prefix='/api/v1')
 def read_event(renginys_id):
     cache_key = f"event:{renginys_id}"
 
-    # Patikrinam Redis cache
-    cached = redis.get_cache(cache_key)
-    if cached:
-        print(f"Loaded event {renginys_id} from Redis")
-        return jsonify({"cached": True, "event": cached})
-
-    # Jei nėra cache, paimame iš Mongo
-    event = db.renginiai.find_one({"_id": renginys_id})
+    # Redis cache; jei nėra - tik vienas worker'is krauna iš Mongo
+    event, cached = redis.cache_aside(
+        cache_key,
+        lambda: db.renginiai.find_one({"_id": renginys_id}),
+    )
     if not event:
         return jsonify({"ok": False, "error": "Event not found"})
 
-    # Įdedam į cache 
-    redis.set_cache(cache_key, event)
-    print(f"Loaded event {renginys_id} from Mongo and cached in Redis")
-
-    return jsonify({"cached": False, "event": event})
+    print(f"Loaded event {renginys_id} from {'Redis' if cached else 'Mongo'}")
+    return jsonify({"cached": cached, "event": event})
 
 @events_bp.get("/events")
 def read_all_events():
-    # Patikrinam globalų valid_events raktą
-    valid_ids = redis.get_cache("valid_events")
-    
-    if valid_ids:
+    # naive datos (Mongo, senesni string'ai) laikomos UTC, kaip ir Neo4j pusėje
+    now = datetime.now(timezone.utc)
+
+    # Patikrinam sorted set; praėję renginiai išmetami tame pačiame round trip
+    valid_ids = redis.zrange_from(VALID_EVENTS_KEY, now.timestamp())
+
+    if valid_ids is not None:
         print("Loaded valid event IDs from Redis")
         return jsonify({"cached": True, "event_ids": valid_ids})
     
-    # Jei nėra cache, paimam visus renginius iš Mongo
+    # Jei nėra cache, filtruojam Mongo pusėje: tik būsimi renginiai su likučiu
     print("Loading valid events from MongoDB...")
-    events = list(db.renginiai.find({}))
-
-    valid_ids = []
-    now = datetime.now()
-
-    for ev in events:
-    # Tikrinam ar renginys turi bilietų likutį > 0
-        tickets = ev.get("Bilieto_tipas", [])
-        has_available = any(int(t.get("Likutis", 0)) > 0 for t in tickets)
-
+    query = {
+        "Bilieto_tipas.Likutis": {"$gt": 0},
+        # Data gali būti saugoma ir kaip datetime, ir kaip ISO string
+        "$or": [
+            {"Data": {"$gt": now}},
+            {"Data": {"$gt": now.isoformat()}},
+        ],
+    }
+    scores = {}
+    for ev in db.renginiai.find(query, {"_id": 1, "Data": 1}).sort("Data", 1):
         event_date = ev.get("Data")
         if isinstance(event_date, str):
-        # jei data Mongo kaip string, konvertuojam į datetime
+            # jei data Mongo kaip string, konvertuojam į datetime
             event_date = datetime.fromisoformat(event_date.replace("Z", "+00:00"))
+        if event_date.tzinfo is None:
+            event_date = event_date.replace(tzinfo=timezone.utc)
+        scores[str(ev["_id"])] = event_date.timestamp()
 
-        print(event_date, now)
-        not_past = event_date > now
-        
-        if has_available and not_past:
-            event_id_str = str(ev["_id"])
-            valid_ids.append(event_id_str)
-
-            # Kuriam atskirą raktą kiekvienam renginiui
-            redis.set_cache(f"event:{event_id_str}", ev)
-            print(f"Cached event {event_id_str}")
-
-    # Įrašom globalų sąrašą į cache
-    redis.set_cache("valid_events", valid_ids)
-    print("✅ Cached list of valid event IDs")
+    # Įrašom sorted set (pilnus renginius read_event cache'ina pats)
+    redis.replace_sorted_set(VALID_EVENTS_KEY, scores)
+    print(f"✅ Cached {len(scores)} valid event IDs")
 
-    # Grąžinam rezultatą
+    # Grąžinam rezultatą (surikiuota pagal datą)
+    valid_ids = sorted(scores, key=scores.get)
     return jsonify({"cached": False, "event_ids": valid_ids})
@@ -1,36 +1,70 @@
 from flask import Blueprint, jsonify, request
-from backend.app.extensions import db, redis, neo4, clickhouse
+from pymongo import ReturnDocument
+from backend.app.extensions import db, redis
+from backend.app.config import VALID_EVENTS_KEY, INVENTORY_MODE
+from backend.app.utils import outbox
+from backend.redysas.ops import RESERVE_OK, RESERVE_NOT_SEEDED
 from datetime import datetime, timezone
+import time
 
 # URL prefix is /api/v1
 purchase_bp = Blueprint('purchase', __name__, url_prefix='/api/v1')
 
 
-# FINAL URL: /api/v1 + "/purchase" = /api/v1/purchase
-@purchase_bp.route("/purchase", methods=["POST", "OPTIONS"])
-def purchase():
-    # Handle CORS preflight
-    if request.method == "OPTIONS":
-        return ("", 200)
-
-    payload = request.get_json(force=True) or {}
-    vartotojo_id = payload.get("vartotojo_id")
-    renginys_id = payload.get("renginys_id")
-    bilieto_tipas_id = payload.get("bilieto_tipas_id")
-    kiekis = int(payload.get("kiekis", 1))
-
-    if not (vartotojo_id and renginys_id and kiekis > 0):
-        return jsonify({
-            "ok": False,
-            "error": "Provide vartotojo_id, renginys_id, and kiekis>0."
-        })
-
-    if not db.vartotojai.find_one({"_id": vartotojo_id}):
-        return jsonify({
-            "ok": False,
-            "error": "User not found. Register first."
-        })
-
+class PurchaseError(Exception):
+    """Purchase rejected; the message is returned to the client."""
+
+
+def _choose_ticket_type(ev, bilieto_tipas_id):
+    tickets = ev.get("Bilieto_tipas") or []
+    if not tickets:
+        raise PurchaseError("This event has no ticket types.")
+
+    for ticket_type in tickets:
+        if ticket_type.get("Bilieto_tipas_id") == bilieto_tipas_id:
+            return ticket_type
+
+    raise PurchaseError("Ticket type not found for this event.")
+
+
+def _new_order(vartotojo_id, renginys_id, bilieto_tipas_id, kiekis, chosen):
+    return {
+        "vartotojo_id": vartotojo_id,
+        "uzsakymo_data": datetime.now(timezone.utc),
+        "Bilietai": [{
+            "renginys_id": renginys_id,
+            "Bilieto_tipas_id": bilieto_tipas_id,
+            "Kiekis": kiekis,
+            "Kaina": chosen.get("Kaina")
+        }]
+    }
+
+
+def _enqueue_side_effects(order, new_likutis, session, event_date=None, version=None):
+    """Neo4j / ClickHouse sinchronizacija vyksta fone per Outbox."""
+    bilietas = order["Bilietai"][0]
+    outbox.enqueue(db, [
+        (outbox.NEO4J_ADD_PURCHASE, {
+            "user_id": order["vartotojo_id"],
+            "event_id": bilietas["renginys_id"],
+            "event_date": event_date,
+            # BOUGHT raktas order_item_id = "<order_id>-0", kaip ir importeryje
+            "order_id": order["_id"],
+        }),
+        (outbox.CH_SYNC_ORDER_ITEM, order),
+        (outbox.CH_UPDATE_TICKET_INVENTORY, {
+            "event_id": bilietas["renginys_id"],
+            "bilieto_tipas_id": bilietas["Bilieto_tipas_id"],
+            "likutis": new_likutis,
+            # versija pagal pirkimo eilę, kad pavėlavęs retry neperrašytų naujesnio likučio:
+            # mongo režime tvarką užtikrina transakcija, redis režime - Lua rezervacijos numeris
+            "version": version or time.time_ns(),
+        }),
+    ], session=session)
+
+
+def _purchase_with_mongo_transaction(vartotojo_id, renginys_id, bilieto_tipas_id, kiekis):
+    """Default mode: Mongo multi-document transaction is the source of truth."""
     with db.client.start_session() as s:
         with s.start_transaction():
             cache_key = f"event:{renginys_id}"
@@ -40,37 +74,16 @@ def purchase():
             if not ev:
                 ev = db.renginiai.find_one({"_id": renginys_id}, session=s)
                 if not ev:
-                    return jsonify({"ok": False, "error": "Event not found."})
-
-            tickets = ev.get("Bilieto_tipas") or []
-            if not tickets:
-                return jsonify({
-                    "ok": False,
-                    "error": "This event has no ticket types."
-                })
-
-            print(tickets)
-            chosen = None
-            for ticket_type in tickets:
-                print(ticket_type.get("Bilieto_tipas_id"), bilieto_tipas_id)
-                if ticket_type.get("Bilieto_tipas_id") == bilieto_tipas_id:
-                    chosen = ticket_type
-                    break
-
-            if not chosen:
-                return jsonify({
-                    "ok": False,
-                    "error": "Ticket type not found for this event."
-                })
+                    raise PurchaseError("Event not found.")
+
+            chosen = _choose_ticket_type(ev, bilieto_tipas_id)
 
             likutis = int(chosen.get("Likutis", 0))
             if kiekis > likutis:
-                return jsonify({
-                    "ok": False,
-                    "error": f"Not enough tickets. Remainder: {likutis}"
-                })
+                raise PurchaseError(f"Not enough tickets. Remainder: {likutis}")
 
-            res = db.renginiai.update_one(
+            # dokumentas po $inc (šios transakcijos vaizdas) -> iš jo tikrinam išpardavimą
+            updated_event = db.renginiai.find_one_and_update(
                 {
                     "_id": renginys_id,
                     "Bilieto_tipas": {
@@ -81,55 +94,111 @@ def purchase():
                     }
                 },
                 {"$inc": {"Bilieto_tipas.$.Likutis": -kiekis}},
+                projection={"Bilieto_tipas": 1},
+                return_document=ReturnDocument.AFTER,
                 session=s
             )
-            if res.modified_count != 1:
-                return jsonify({
-                    "ok": False,
-                    "error": "Concurrent update issue."
-                })
-
-            order = {
-                "vartotojo_id": vartotojo_id,
-                "uzsakymo_data": datetime.now(timezone.utc),
-                "Bilietai": [{
-                    "renginys_id": renginys_id,
-                    "Bilieto_tipas_id": bilieto_tipas_id,
-                    "Kiekis": kiekis,
-                    "Kaina": chosen.get("Kaina")
-                }]
-            }
+            if updated_event is None:
+                raise PurchaseError("Concurrent update issue.")
+
+            order = _new_order(vartotojo_id, renginys_id, bilieto_tipas_id, kiekis, chosen)
             ins = db.uzsakymai.insert_one(order, session=s)
+            order["_id"] = str(ins.inserted_id)   # Add MongoDB _id to order
+            _enqueue_side_effects(order, likutis - kiekis, session=s, event_date=ev.get("Data"))
+
+    # Redis keičiam tik po commit'o, kitaip lygiagretus read_event vėl užcache'intų seną renginį
+    redis.invalidate_cache(cache_key)
+
+    # Patikrinam ar liko bilietų → jei ne, pašalinam iš valid_events
+    tickets = updated_event.get("Bilieto_tipas", [])
+    has_available = any(int(t.get("Likutis", 0)) > 0 for t in tickets)
+
+    if not has_available:
+        redis.zremove(VALID_EVENTS_KEY, str(renginys_id))
+
+    return order
+
+
+def _purchase_with_redis_inventory(vartotojo_id, renginys_id, bilieto_tipas_id, kiekis):
+    """
+    INVENTORY_MODE = "redis": Likutis counters live in Redis and are decremented
+    by an atomic Lua check-and-decrement. Losing buyers are rejected without
+    touching Mongo; InventoryFlusher moves the deltas to Renginiai in batches.
+    """
+    cache_key = f"event:{renginys_id}"
+    ev, _ = redis.cache_aside(cache_key, lambda: db.renginiai.find_one({"_id": renginys_id}))
+    if not ev:
+        raise PurchaseError("Event not found.")
+
+    chosen = _choose_ticket_type(ev, bilieto_tipas_id)
+
+    status, likutis, total, version = redis.reserve_tickets(renginys_id, bilieto_tipas_id, kiekis)
+    if status == RESERVE_NOT_SEEDED:
+        # pirmas pirkimas šiam renginiui - užkraunam likučius iš Mongo
+        fresh = db.renginiai.find_one({"_id": renginys_id}, {"Bilieto_tipas": 1}) or {}
+        redis.seed_inventory(renginys_id, {
+            t.get("Bilieto_tipas_id"): int(t.get("Likutis", 0))
+            for t in fresh.get("Bilieto_tipas") or []
+        })
+        status, likutis, total, version = redis.reserve_tickets(renginys_id, bilieto_tipas_id, kiekis)
 
-            # Aktyvi invalidacija
-            redis.invalidate_cache(cache_key)
-
-            # Patikrinam ar liko bilietų → jei ne, pašalinam iš valid_events
-            updated_event = db.renginiai.find_one({"_id": renginys_id})
-            tickets = updated_event.get("Bilieto_tipas", [])
-            has_available = any(int(t.get("Likutis", 0)) > 0 for t in tickets)
-
-            valid_ids = redis.get_cache("valid_events") or []
-            if not has_available:
-                valid_ids = [eid for eid in valid_ids if eid != str(renginys_id)]
-                redis.set_cache("valid_events", valid_ids)
-
-    # ✅ ADDED: Record purchase in Neo4j for recommendations
-# pridedam i neo4j
-    neo4.add_purchase(vartotojo_id, renginys_id)
-    
-    # 📤 SYNC TO CLICKHOUSE (NEW - ADD THESE LINES)
-    order["_id"] = str(ins.inserted_id)   # Add MongoDB _id to order
-    
-    try:
-        clickhouse.sync_order_item(order)
-    except Exception as e:
-        print(f"⚠️ ClickHouse order sync failed: {e}")
+    if status != RESERVE_OK:
+        raise PurchaseError(f"Not enough tickets. Remainder: {likutis}")
 
+    order = _new_order(vartotojo_id, renginys_id, bilieto_tipas_id, kiekis, chosen)
     try:
-        new_likutis = likutis - kiekis
-        clickhouse.update_ticket_inventory(renginys_id, bilieto_tipas_id, new_likutis)
-    except Exception as e:
-        print(f"⚠️ ClickHouse inventory update failed: {e}")
+        # tik įterpimai (be konkurencijos dėl Renginiai dokumento)
+        with db.client.start_session() as s:
+            with s.start_transaction():
+                ins = db.uzsakymai.insert_one(order, session=s)
+                order["_id"] = str(ins.inserted_id)   # Add MongoDB _id to order
+                _enqueue_side_effects(order, likutis, session=s, event_date=ev.get("Data"),
+                                      version=version)
+    except Exception:
+        redis.release_tickets(renginys_id, bilieto_tipas_id, kiekis)
+        raise
 
-    return jsonify({"ok": True, "message": "Purchase successful.", "order_id": str(ins.inserted_id), "order": order})
\ No newline at end of file
+    redis.invalidate_cache(cache_key)
+    if total == 0:
+        redis.zremove(VALID_EVENTS_KEY, str(renginys_id))
+
+    return order
+
+
+# FINAL URL: /api/v1 + "/purchase" = /api/v1/purchase
+@purchase_bp.route("/purchase", methods=["POST", "OPTIONS"])
+def purchase():
+    # Handle CORS preflight
+    if request.method == "OPTIONS":
+        return ("", 200)
+
+    payload = request.get_json(force=True) or {}
+    vartotojo_id = payload.get("vartotojo_id")
+    renginys_id = payload.get("renginys_id")
+    bilieto_tipas_id = payload.get("bilieto_tipas_id")
+    kiekis = int(payload.get("kiekis", 1))
+
+    if not (vartotojo_id and renginys_id and kiekis > 0):
+        return jsonify({
+            "ok": False,
+            "error": "Provide vartotojo_id, renginys_id, and kiekis>0."
+        })
+
+    if not db.vartotojai.find_one({"_id": vartotojo_id}):
+        return jsonify({
+            "ok": False,
+            "error": "User not found. Register first."
+        })
+
+    try:
+        if INVENTORY_MODE == "redis":
+            order = _purchase_with_redis_inventory(
+                vartotojo_id, renginys_id, bilieto_tipas_id, kiekis)
+        else:
+            order = _purchase_with_mongo_transaction(
+                vartotojo_id, renginys_id, bilieto_tipas_id, kiekis)
+    except PurchaseError as e:
+        return jsonify({"ok": False, "error": str(e)})
+
+    # Neo4j ir ClickHouse atnaujina OutboxWorker po commit'o
+    return jsonify({"ok": True, "message": "Purchase successful.", "order_id": order["_id"], "order": order})
\ No newline at end of file
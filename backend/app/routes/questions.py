@@ -1,9 +1,30 @@
 from flask import Blueprint, jsonify, request
 from backend.app.extensions import cassandra
+from backend.casa.kasandre import DEFAULT_PAGE_SIZE
 from datetime import datetime
 
 questions_bp = Blueprint('questions', __name__, url_prefix='/api/v1')
 
+MAX_PAGE_SIZE = 500
+
+
+def _page_args():
+    """?page_size=&cursor= -> (page_size, cursor); raises ValueError on bad input."""
+    page_size = int(request.args.get("page_size", DEFAULT_PAGE_SIZE))
+    if not 1 <= page_size <= MAX_PAGE_SIZE:
+        raise ValueError(f"page_size must be between 1 and {MAX_PAGE_SIZE}")
+    return page_size, request.args.get("cursor") or None
+
+
+def _paged(fetch, key, *args):
+    """Run a paged repository getter and wrap it as {ok, <key>, next_cursor}."""
+    try:
+        page_size, cursor = _page_args()
+        items, next_cursor = fetch(*args, page_size=page_size, cursor=cursor)
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    return jsonify({"ok": True, key: items, "next_cursor": next_cursor})
+
 # ----------------------
 # INSERT klausimas
 # ----------------------
@@ -33,21 +54,26 @@ def create_answer():
 # ----------------------
 @questions_bp.get("/questions_with_answers")
 def get_questions_with_answers():
-    limit = int(request.args.get("limit", 50))
+    # limit tampa driver'io fetch_size: 0 ar neigiamas reikštų visą lentelę
+    try:
+        limit = int(request.args.get("limit", 50))
+    except ValueError:
+        limit = 0
+    if not 1 <= limit <= MAX_PAGE_SIZE:
+        return jsonify({"ok": False, "error": f"limit must be between 1 and {MAX_PAGE_SIZE}"}), 400
     questions = cassandra.get_questions_with_answers(limit)
     return jsonify(questions)
 
 
 @questions_bp.get("/get_questions")
 def get_questions():
-    questions = cassandra.get_questions_all()
-    return jsonify({"ok": True, "questions": questions})
+    # ?page_size=N&cursor=<next_cursor iš ankstesnio atsakymo>
+    return _paged(cassandra.get_questions_all, "questions")
 
 
 @questions_bp.get("/get_questions_by_event/<event_id>")
 def get_questions_by_event(event_id):
-    questions = cassandra.get_questions_by_event(event_id)
-    return jsonify({"ok": True, "questions": questions})
+    return _paged(cassandra.get_questions_by_event, "questions", event_id)
 
 @questions_bp.get("/get_questions_by_date")
 def get_questions_by_date():
@@ -60,8 +86,7 @@ def get_questions_by_date():
     except ValueError:
         return jsonify({"ok": False, "error": "Invalid date format. Use YYYY-MM-DD."}), 400
 
-    questions = cassandra.get_questions_by_date(qdate)
-    return jsonify({"ok": True, "questions": questions})
+    return _paged(cassandra.get_questions_by_date, "questions", qdate)
 
 @questions_bp.get("/get_questions_by_event_and_date/<event_id>")
 def get_questions_by_event_and_date(event_id):
@@ -74,12 +99,10 @@ def get_questions_by_event_and_date(event_id):
     except ValueError:
         return jsonify({"ok": False, "error": "Invalid date format. Use YYYY-MM-DD."}), 400
 
-    questions = cassandra.get_questions_by_event_and_date(event_id, qdate)
-    return jsonify({"ok": True, "questions": questions})
+    return _paged(cassandra.get_questions_by_event_and_date, "questions", event_id, qdate)
 
 # ---- Answers (simple) ----
 
 @questions_bp.get("/get_answers_by_question/<question_id>")
 def get_answers_by_question(question_id):
-    answers = cassandra.get_answers_by_question(question_id)
-    return jsonify({"ok": True, "answers": answers})
\ No newline at end of file
+    return _paged(cassandra.get_answers_by_question, "answers", question_id)
\ No newline at end of file
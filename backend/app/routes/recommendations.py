@@ -1,20 +1,63 @@
-from flask import Blueprint, jsonify
-from backend.app.extensions import neo4
-from backend.app.routes.analytics import top3_by_tickets as top3
+from flask import Blueprint, jsonify, request
+from backend.app.extensions import neo4, redis, reco
+from backend.app.config import (
+    RECO_CACHE_TTL, RECO_BATCH_MAX_USERS, RECO_BATCH_MAX_LIMIT, RECO_COLD_START_KEY,
+    RECO_COLD_START_TTL, RECO_NO_HISTORY, reco_key,
+)
+from backend.app.routes.analytics import compute_top3_by_tickets
 recommendations_bp = Blueprint('recommendations', __name__, url_prefix='/api/v1')
 
 
+def _cached(user_id, variant, compute):
+    """
+    Per-user recommendation cache; invalidated by purchases (see utils/recommendations.py).
+    compute() returns None for users without purchase history; that is cached as the
+    RECO_NO_HISTORY sentinel (same TTL) and returned as None again.
+    """
+    def load():
+        result = compute()
+        return RECO_NO_HISTORY if result is None else result
+
+    result, cached = redis.cache_aside(reco_key(user_id, variant), load, ttl=RECO_CACHE_TTL)
+    if cached:
+        print(f"Loaded {variant} recommendations for {user_id} from Redis")
+    return None if result == RECO_NO_HISTORY else result
+
+
+def _collaborative(user_id, variant, compute):
+    """
+    Cached per user for the Neo4j engine. The sparse engine is not cached: it
+    answers in-process, and its matrix sees a purchase only after the next
+    refresh, so re-caching right after the purchase invalidation would keep the
+    pre-purchase recommendations for another RECO_CACHE_TTL.
+    """
+    if reco is neo4:
+        return _cached(user_id, variant, compute)
+    return compute()
+
+
+def _cold_start():
+    """Shared fallback for users without history (top3 by tickets, cached longer, served stale)."""
+    doc, _ = redis.cache_aside(
+        RECO_COLD_START_KEY,
+        compute_top3_by_tickets,
+        ttl=RECO_COLD_START_TTL,
+        stale_ttl=RECO_COLD_START_TTL * 24,
+    )
+    return doc
+
+
 @recommendations_bp.get("/recommendations/<user_id>")
 def get_recommendations(user_id):
     """Get all recommended events for user (riboto gylio)"""
-    print(f"Getting recommendations for user {user_id}")
-    if neo4.has_purchase_history(user_id):
-        print("User has purchase history, getting collaborative recommendations")
-        events = neo4.recommend_collaborative(user_id)
-    else:
-        print("User has no purchase history, returning top3 events by tickets sold")
-        events = top3()
+    def compute():
+        print(f"Getting recommendations for user {user_id}")
+        return reco.recommend_collaborative(user_id)
 
+    events = _collaborative(user_id, "all", compute)
+    if events is None:
+        print("User has no purchase history, returning top3 events by tickets sold")
+        events = _cold_start()
     return jsonify(events), 200
 
 
@@ -25,17 +68,19 @@ def get_upcoming_recommendations(user_id):
 
     Jei vartotojas turi istoriją – pirmiausia bandom collaborative,
     jeigu nieko nėra – imam paprastus artimiausius.
-    Jei istorijos nėra – irgi imam artimiausius.
+    Jei istorijos nėra – grąžinam bendrą cold-start sąrašą.
     """
-    print(f"Getting upcoming recommendations for user {user_id}")
-    if neo4.has_purchase_history(user_id):
-        print("User has purchase history, getting collaborative recommendations")
-        events = neo4.recommend_collaborative_upcoming(user_id)
-        if not events:
+    def compute():
+        print(f"Getting upcoming recommendations for user {user_id}")
+        events = reco.recommend_collaborative_upcoming(user_id)
+        if events == []:
             events = neo4.get_upcoming_events(months=24, limit=5)
-    else:
+        return events
+
+    events = _collaborative(user_id, "upcoming", compute)
+    if events is None:
         print("User has no purchase history, returning top3 events by tickets sold")
-        events = top3()
+        events = _cold_start()
     return jsonify(events), 200
 
 
@@ -45,9 +90,40 @@ def get_recommended_organizers(user_id):
     Rekomenduojami organizatoriai, naudojant
     neo4.recommend_organizers_unlimited (neribotas gylis / laikas).
     """
+    def compute():
+        return neo4.recommend_organizers_unlimited(user_id, limit=3)
+
     # jei vartotojas nieko nepirko – grąžinam tuščią, frontend gali slėpti bloką
-    if not neo4.has_purchase_history(user_id):
-        return jsonify([]), 200
+    return jsonify(_cached(user_id, "organizers", compute) or []), 200
+
+
+@recommendations_bp.post("/recommendations/batch")
+def get_batch_recommendations():
+    """
+    Body: { "user_ids": ["...", "..."], "limit": 10 }
+    Collaborative rekomendacijos daugeliui vartotojų (pvz. el. laiškų kampanijoms).
+    Vartotojams be istorijos grąžinamas cold-start sąrašas.
+    """
+    body = request.get_json(force=True) or {}
+    user_ids = body.get("user_ids") or []
+    try:
+        limit = int(body.get("limit", 10))
+    except (TypeError, ValueError):
+        return jsonify({"ok": False, "error": "limit must be an integer"}), 400
+    limit = max(1, min(limit, RECO_BATCH_MAX_LIMIT))
+
+    if not isinstance(user_ids, list) or not user_ids:
+        return jsonify({"ok": False, "error": "user_ids must be a non-empty list"}), 400
+    if len(user_ids) > RECO_BATCH_MAX_USERS:
+        return jsonify({
+            "ok": False,
+            "error": f"At most {RECO_BATCH_MAX_USERS} user_ids per request"
+        }), 400
 
-    organizers = neo4.recommend_organizers_unlimited(user_id, limit=3)
-    return jsonify(organizers), 200
\ No newline at end of file
+    recommendations = neo4.recommend_collaborative_batch([str(u) for u in user_ids], limit=limit)
+    if any(recs is None for recs in recommendations.values()):
+        cold_start = _cold_start()
+        recommendations = {
+            u: cold_start if recs is None else recs for u, recs in recommendations.items()
+        }
+    return jsonify({"ok": True, "recommendations": recommendations}), 200
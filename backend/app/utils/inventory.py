@@ -0,0 +1,93 @@
+import atexit
+import threading
+
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+
+class InventoryFlusher:
+    """
+    Applies ticket deltas reserved in Redis to Mongo `Renginiai` in batches.
+
+    Used only when INVENTORY_MODE = "redis": purchases decrement the Redis
+    counters atomically and this worker moves the accumulated deltas to Mongo
+    with one bulk_write per interval.
+    """
+
+    def __init__(self, db, redis, interval=1.0):
+        self.db = db
+        self.redis = redis
+        self.interval = interval
+        self._stop = threading.Event()
+        self._thread = None
+
+    def flush(self):
+        try:
+            deltas = self.redis.drain_inventory_deltas()
+        except Exception as e:
+            print(f"⚠️ Inventory drain failed: {e}")
+            return 0
+        if not deltas:
+            return 0
+
+        keys = [key for key, delta in deltas.items() if delta]
+        ops = [
+            UpdateOne(
+                {"_id": event_id, "Bilieto_tipas.Bilieto_tipas_id": ticket_type_id},
+                {"$inc": {"Bilieto_tipas.$.Likutis": deltas[(event_id, ticket_type_id)]}},
+            )
+            for event_id, ticket_type_id in keys
+        ]
+        if not ops:
+            return 0
+
+        failed = set()
+        try:
+            matched = self.db.renginiai.bulk_write(ops, ordered=False).matched_count
+        except BulkWriteError as e:
+            # unordered: visi kiti op'ai jau pritaikyti - grąžinam tik nepavykusius
+            failed = {keys[err["index"]] for err in e.details.get("writeErrors", [])}
+            matched = e.details.get("nMatched", 0)
+            print(f"⚠️ Inventory flush to Mongo: {len(failed)}/{len(ops)} updates failed")
+            self.redis.restore_inventory_deltas({key: deltas[key] for key in failed})
+        except Exception as e:
+            # nieko nepatvirtinta (pvz. ryšio klaida) - grąžinam visus pokyčius
+            print(f"⚠️ Inventory flush to Mongo failed: {e}")
+            self.redis.restore_inventory_deltas(deltas)
+            return 0
+
+        applied = [key for key in keys if key not in failed]
+        if matched < len(applied):
+            self._report_unmatched(applied, deltas)
+        # pirkimas event:<id> išmetė dar prieš pasikeičiant Mongo - išmetam dar kartą
+        self.redis.invalidate_many({f"event:{event_id}" for event_id, _ in applied})
+        return len(applied)
+
+    def _report_unmatched(self, applied, deltas):
+        """Log deltas whose UpdateOne matched no ticket type (event or type removed); they are dropped."""
+        event_ids = list({event_id for event_id, _ in applied})
+        existing = {
+            (ev["_id"], t.get("Bilieto_tipas_id"))
+            for ev in self.db.renginiai.find({"_id": {"$in": event_ids}}, {"Bilieto_tipas.Bilieto_tipas_id": 1})
+            for t in ev.get("Bilieto_tipas", [])
+        }
+        for event_id, ticket_type_id in applied:
+            if (event_id, ticket_type_id) not in existing:
+                print(f"⚠️ Inventory delta {deltas[(event_id, ticket_type_id)]} for "
+                      f"{event_id}/{ticket_type_id} matched no ticket type, dropped")
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            self.flush()
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, name="inventory-flusher", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
+        self.flush()
@@ -0,0 +1,140 @@
+import atexit
+import threading
+from datetime import datetime, timedelta, timezone
+
+from pymongo import ReturnDocument
+
+from backend.app.utils.recommendations import invalidate_recommendations
+
+# Užduočių pavadinimai (Outbox.task)
+NEO4J_ADD_PURCHASE = "neo4j.add_purchase"
+NEO4J_ADD_USER = "neo4j.add_user"
+CH_SYNC_ORDER_ITEM = "clickhouse.sync_order_item"
+CH_UPDATE_TICKET_INVENTORY = "clickhouse.update_ticket_inventory"
+CH_SYNC_USER = "clickhouse.sync_user"
+
+
+def enqueue(db, tasks, session=None):
+    """
+    Write side-effect tasks [(task, payload), ...] to the Mongo `Outbox` collection.
+    Pass the session of the surrounding transaction so tasks commit together with the data.
+    """
+    now = datetime.now(timezone.utc)
+    docs = [
+        {
+            "task": task,
+            "payload": payload,
+            "status": "pending",
+            "attempts": 0,
+            "next_attempt_at": now,
+            "created_at": now,
+        }
+        for task, payload in tasks
+    ]
+    if docs:
+        db.outbox.insert_many(docs, session=session)
+
+
+def build_handlers(neo4, clickhouse, redis, invalidate_co_buyers=False):
+    """Map outbox task names to the Neo4j / ClickHouse calls they replay."""
+    def add_purchase(p):
+        neo4.add_purchase(p["user_id"], p["event_id"], p.get("event_date"), p.get("order_id"))
+        # grafas pasikeitė -> išmetam pasenusias rekomendacijas
+        invalidate_recommendations(
+            redis, neo4, p["user_id"], p["event_id"], include_co_buyers=invalidate_co_buyers
+        )
+
+    return {
+        NEO4J_ADD_PURCHASE: add_purchase,
+        NEO4J_ADD_USER: lambda p: neo4.add_user(**p),
+        CH_SYNC_ORDER_ITEM: clickhouse.sync_order_item,
+        CH_UPDATE_TICKET_INVENTORY: lambda p: clickhouse.update_ticket_inventory(
+            p["event_id"], p["bilieto_tipas_id"], p["likutis"], p.get("version")
+        ),
+        CH_SYNC_USER: clickhouse.sync_user,
+    }
+
+
+class OutboxWorker:
+    """
+    Background worker that drains the Mongo `Outbox` collection.
+
+    Tasks are claimed with find_one_and_update (safe with several workers),
+    deleted on success and retried with exponential backoff on failure.
+    A task still "processing" after `lease` seconds (crashed worker) is claimed again.
+    """
+
+    def __init__(self, db, handlers, interval=0.5, max_attempts=8, lease=60, max_backoff=300):
+        self.db = db
+        self.handlers = handlers
+        self.interval = interval
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.max_backoff = max_backoff
+        self._stop = threading.Event()
+        self._thread = None
+
+    def _claim(self):
+        now = datetime.now(timezone.utc)
+        return self.db.outbox.find_one_and_update(
+            {"$or": [
+                {"status": "pending", "next_attempt_at": {"$lte": now}},
+                {"status": "processing", "locked_until": {"$lte": now}},
+            ]},
+            {
+                "$set": {"status": "processing", "locked_until": now + timedelta(seconds=self.lease)},
+                "$inc": {"attempts": 1},
+            },
+            sort=[("next_attempt_at", 1)],
+            return_document=ReturnDocument.AFTER,
+        )
+
+    def process_one(self):
+        """Run one due task; returns False when there is nothing to do."""
+        doc = self._claim()
+        if doc is None:
+            return False
+
+        try:
+            handler = self.handlers[doc["task"]]
+            handler(doc["payload"])
+        except Exception as e:
+            attempts = doc.get("attempts", 1)
+            print(f"⚠️ Outbox task {doc['task']} failed (attempt {attempts}): {e}")
+            if attempts >= self.max_attempts:
+                update = {"status": "failed", "last_error": str(e)}
+            else:
+                backoff = min(2 ** attempts, self.max_backoff)
+                update = {
+                    "status": "pending",
+                    "last_error": str(e),
+                    "next_attempt_at": datetime.now(timezone.utc) + timedelta(seconds=backoff),
+                }
+            self.db.outbox.update_one({"_id": doc["_id"]}, {"$set": update})
+            return True
+
+        self.db.outbox.delete_one({"_id": doc["_id"]})
+        return True
+
+    def drain(self):
+        while not self._stop.is_set() and self.process_one():
+            pass
+
+    def _loop(self):
+        while not self._stop.is_set():
+            try:
+                self.drain()
+            except Exception as e:
+                print(f"⚠️ Outbox worker error: {e}")
+            self._stop.wait(self.interval)
+
+    def start(self):
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, name="outbox-worker", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
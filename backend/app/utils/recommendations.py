@@ -0,0 +1,15 @@
+from backend.app.config import RECO_VARIANTS, reco_key
+
+
+def invalidate_recommendations(redis, neo4, user_id, event_id=None, include_co_buyers=False):
+    """
+    Drop cached recommendations of a user after a purchase.
+
+    With include_co_buyers, entries of everyone else who bought `event_id` are
+    dropped too (their CO_BOUGHT scores changed); they are recomputed lazily.
+    """
+    users = {user_id}
+    if include_co_buyers and event_id is not None:
+        users.update(neo4.co_buyers(event_id))
+
+    redis.invalidate_many(reco_key(u, variant) for u in users for variant in RECO_VARIANTS)
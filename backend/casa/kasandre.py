@@ -114,9 +114,114 @@
 #         print("✅ Cassandra connection closed")
 
 
-from uuid import UUID, uuid4
-from datetime import datetime, date
+from uuid import UUID, uuid1, uuid4
+from datetime import date
+import base64
+import heapq
+import time
+from itertools import islice
+from cassandra import InvalidRequest
 from cassandra.cluster import Cluster
+from cassandra.protocol import ProtocolException
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.util import max_uuid_from_time
+
+DEFAULT_PAGE_SIZE = 100
+# Kiek atsakymų užklausų vienu metu leidžiam get_questions_with_answers
+ANSWERS_CONCURRENCY = 32
+# questions_by_date_v2 dienos particija skaidoma į tiek bucket'ų (question_id.int % N);
+# turi sutapti su init-scripts/put_data_to_tables.py ir migrate_questions_v2.py
+QUESTION_BUCKETS = 8
+
+# Visi CQL sakiniai paruošiami (prepare) vieną kartą prisijungus.
+# *_v2 lentelės klasterizuotos pagal created_at (timeuuid) DESC - naujausi pirmi.
+CQL = {
+    "insert_question_by_event": """
+        INSERT INTO questions_by_event_v2 (event_id, created_at, question_id, question_date, user_id, question_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "insert_question_by_date": """
+        INSERT INTO questions_by_date_v2 (question_date, bucket, created_at, question_id, event_id, user_id, question_text)
+        VALUES (?, ?, ?, ?, ?, ?, ?)
+    """,
+    "insert_question_by_event_and_date": """
+        INSERT INTO questions_by_event_and_date_v2 (event_id, question_date, created_at, question_id, user_id, question_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "insert_question_all": """
+        INSERT INTO questions_all (question_id, question_date, event_id, user_id, question_text)
+        VALUES (?, ?, ?, ?, ?)
+    """,
+    "insert_answer_by_question": """
+        INSERT INTO answers_by_question_v2 (question_id, created_at, answer_id, answer_date, user_id, answer_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "insert_answer_by_question_and_date": """
+        INSERT INTO answers_by_question_and_date_v2 (question_id, answer_date, created_at, answer_id, user_id, answer_text)
+        VALUES (?, ?, ?, ?, ?, ?)
+    """,
+    "questions_all": "SELECT * FROM questions_all",
+    "questions_by_event": """
+        SELECT * FROM questions_by_event_v2
+        WHERE event_id = ? AND created_at < ? LIMIT ?
+    """,
+    "questions_by_event_and_date": """
+        SELECT * FROM questions_by_event_and_date_v2
+        WHERE event_id = ? AND question_date = ? AND created_at < ? LIMIT ?
+    """,
+    "questions_by_date": """
+        SELECT * FROM questions_by_date_v2
+        WHERE question_date = ? AND bucket = ? AND created_at < ? LIMIT ?
+    """,
+    "answers_by_question": """
+        SELECT * FROM answers_by_question_v2
+        WHERE question_id = ? AND created_at < ? LIMIT ?
+    """,
+    "answers_by_question_limited": "SELECT * FROM answers_by_question_v2 WHERE question_id = ? LIMIT ?",
+    "answers_by_question_and_date": """
+        SELECT * FROM answers_by_question_and_date_v2
+        WHERE question_id = ? AND answer_date = ?
+    """,
+}
+
+
+def encode_cursor(paging_state):
+    """Driver paging_state (bytes) -> opaque URL-safe cursor string."""
+    return base64.urlsafe_b64encode(paging_state).decode("ascii") if paging_state else None
+
+
+def decode_cursor(cursor):
+    """Cursor from the client -> paging_state; raises ValueError if it is malformed."""
+    if not cursor:
+        return None
+    paging_state = base64.urlsafe_b64decode(cursor.encode("ascii"))
+    # b64decode praleidžia svetimus simbolius; priimam tik tai, ką grąžino encode_cursor
+    if encode_cursor(paging_state) != cursor:
+        raise ValueError("Invalid cursor")
+    return paging_state
+
+
+def question_bucket(question_id: UUID):
+    return question_id.int % QUESTION_BUCKETS
+
+
+def _before(cursor):
+    """
+    Keyset cursor for *_v2 reads: created_at (timeuuid) of the last row already returned.
+    No cursor = start from the newest row. Raises ValueError if it is malformed
+    or not a time-based (version 1) UUID, which Cassandra would reject.
+    """
+    if cursor:
+        before = UUID(cursor)
+        if before.version != 1:
+            raise ValueError("Invalid cursor")
+        return before
+    return max_uuid_from_time(time.time() + 86400)
+
+
+def _next_cursor(rows, page_size):
+    return str(rows[-1].created_at) if len(rows) == page_size else None
+
 
 class CassandraRepository:
     def __init__(self, hosts=None, port=9042, keyspace="event_app"):
@@ -128,65 +233,64 @@ class CassandraRepository:
         self.cluster = Cluster(self.hosts, port=self.port)
         self.session = self.cluster.connect()
         self.session.set_keyspace(self.keyspace)
+        self.stmts = {name: self.session.prepare(cql) for name, cql in CQL.items()}
         print("✅ Connected to Cassandra keyspace:", self.keyspace)
 
+    def _fetch_page(self, name, params, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        Read one page (fetch_size = page_size) starting at `cursor`.
+        Returns (rows, next_cursor); next_cursor is None on the last page.
+        """
+        statement = self.stmts[name].bind(params)
+        statement.fetch_size = page_size
+        try:
+            result = self.session.execute(statement, paging_state=decode_cursor(cursor))
+        except (InvalidRequest, ProtocolException) as e:
+            # gerai užkoduotas, bet ne šios užklausos paging_state
+            if cursor:
+                raise ValueError("Invalid cursor") from e
+            raise
+        next_cursor = encode_cursor(result.paging_state) if result.has_more_pages else None
+        return result.current_rows, next_cursor
+
+    def _execute_all(self, statements):
+        """
+        Send [(name, params), ...] concurrently with execute_async and wait for all:
+        denormalized writes cost about one round trip instead of one per table.
+        """
+        futures = [self.session.execute_async(self.stmts[name], params) for name, params in statements]
+        for future in futures:
+            future.result()
+
     # =========================
     # INSERT funkcijos
     # =========================
 
     def insert_question(self, event_id, user_id, text):
         question_id = uuid4()
-        created_at = datetime.utcnow()
+        created_at = uuid1()  # timeuuid: klasterizavimas "naujausi pirmi"
         question_date = date.today()
+        bucket = question_bucket(question_id)
 
-        self.session.execute(
-            """
-            INSERT INTO questions_by_event (event_id, question_date, question_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (event_id, question_date, question_id, user_id, text),
-        )
-
-        self.session.execute(
-            """
-            INSERT INTO questions_by_date (question_date, question_id, event_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (question_date, question_id, event_id, user_id, text),
-        )
-
-        self.session.execute("""
-            INSERT INTO questions_by_event_and_date (event_id, question_date, question_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (event_id, question_date, question_id, user_id, text))
-
-        self.session.execute(
-            """
-            INSERT INTO questions_all (question_id, question_date, event_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (question_id, question_date, event_id, user_id, text),
-        )
+        self._execute_all([
+            ("insert_question_by_event", (event_id, created_at, question_id, question_date, user_id, text)),
+            ("insert_question_by_date", (question_date, bucket, created_at, question_id, event_id, user_id, text)),
+            ("insert_question_by_event_and_date", (event_id, question_date, created_at, question_id, user_id, text)),
+            ("insert_question_all", (question_id, question_date, event_id, user_id, text)),
+        ])
 
         return {"question_id": str(question_id)}
 
     def insert_answer(self, question_id, user_id, text):
         question_uuid = UUID(question_id)
         answer_id = uuid4()
+        created_at = uuid1()
         answer_date = date.today()
 
-        self.session.execute(
-           """
-            INSERT INTO answers_by_question (question_id, answer_date, answer_id, user_id, answer_text)
-            VALUES (%s, %s, %s, %s, %s)
-            """,
-            (question_uuid, answer_date, answer_id, user_id, text),
-        )
-
-        self.session.execute("""
-            INSERT INTO answers_by_question_and_date (question_id, answer_date, answer_id, user_id, answer_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (question_uuid, answer_date, answer_id, user_id, text))
+        self._execute_all([
+            ("insert_answer_by_question", (question_uuid, created_at, answer_id, answer_date, user_id, text)),
+            ("insert_answer_by_question_and_date", (question_uuid, answer_date, created_at, answer_id, user_id, text)),
+        ])
 
         return {"answer_id": str(answer_id)}
 
@@ -194,112 +298,116 @@ class CassandraRepository:
     # GET funkcijos - FIXED
     # =========================
 
-    def get_questions_all(self, limit=100):
-        """Fetch all questions with proper JSON serialization."""
-        query = f"SELECT * FROM questions_all LIMIT {limit}"
-        rows = self.session.execute(query)
+    @staticmethod
+    def _question(row):
+        return {
+            "question_id": str(row.question_id),
+            "event_id": row.event_id,
+            "user_id": row.user_id,
+            "text": row.question_text,
+            "question_date": str(row.question_date)
+        }
+
+    @staticmethod
+    def _answer(row):
+        return {
+            "answer_id": str(row.answer_id),
+            "user_id": row.user_id,
+            "text": row.answer_text,
+            "answer_date": str(row.answer_date)
+        }
+
+    def _keyset_page(self, name, params, page_size, cursor):
+        """
+        One newest-first page from a *_v2 table: rows with created_at < cursor.
+        Returns (rows, next_cursor); next_cursor is None once a short page comes back.
+        """
+        rows = list(self.session.execute(self.stmts[name], (*params, _before(cursor), page_size)))
+        return rows, _next_cursor(rows, page_size)
+
+    def get_questions_all(self, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        """Fetch one page of questions with proper JSON serialization. Returns (questions, next_cursor)."""
+        rows, next_cursor = self._fetch_page("questions_all", (), page_size, cursor)
         
         # ✅ Convert UUID and date to strings
-        return [
-            {
-                "question_id": str(row.question_id),
-                "event_id": row.event_id,
-                "user_id": row.user_id,
-                "text": row.question_text,
-                "question_date": str(row.question_date)
-            }
-            for row in rows
-        ]
-
-    def get_questions_by_event(self, event_id):
-        query = "SELECT * FROM questions_by_event WHERE event_id = %s"
-        rows = self.session.execute(query, (event_id,))
-        return [
-            {
-                "question_id": str(row.question_id),
-                "event_id": row.event_id,
-                "user_id": row.user_id,
-                "text": row.question_text,
-                "question_date": str(row.question_date)
-            }
-            for row in rows
-        ]
-
-    def get_questions_by_event_and_date(self, event_id, question_date: date):
-        query = """
-            SELECT * FROM questions_by_event_and_date
-            WHERE event_id = %s AND question_date = %s
+        return [self._question(row) for row in rows], next_cursor
+
+    def get_questions_by_event(self, event_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        rows, next_cursor = self._keyset_page("questions_by_event", (event_id,), page_size, cursor)
+        return [self._question(row) for row in rows], next_cursor
+
+    def get_questions_by_event_and_date(self, event_id, question_date: date,
+                                        page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        rows, next_cursor = self._keyset_page(
+            "questions_by_event_and_date", (event_id, question_date), page_size, cursor
+        )
+        return [self._question(row) for row in rows], next_cursor
+
+    def get_questions_by_date(self, question_date: date, page_size=DEFAULT_PAGE_SIZE, cursor=None):
+        """
+        Newest-first questions of one day. The day is split into QUESTION_BUCKETS
+        partitions; every bucket is read in parallel and the already sorted
+        results are merged (heapq) into one page.
         """
-        rows = self.session.execute(query, (event_id, question_date))
-        return [
-            {
-                "question_id": str(row.question_id),
-                "event_id": row.event_id,
-                "user_id": row.user_id,
-                "text": row.question_text,
-                "question_date": str(row.question_date),
-            }
-            for row in rows
-        ]
-
-    def get_questions_by_date(self, question_date: date):
-        query = "SELECT * FROM questions_by_date WHERE question_date = %s"
-        rows = self.session.execute(query, (question_date,))
-        return [
-            {
-                "question_id": str(row.question_id),
-                "event_id": row.event_id,
-                "user_id": row.user_id,
-                "text": row.question_text,
-                "question_date": str(row.question_date)
-            }
-            for row in rows
-        ]
-
-    def get_answers_by_question(self, question_id):
+        before = _before(cursor)
+        results = execute_concurrent_with_args(
+            self.session,
+            self.stmts["questions_by_date"],
+            [(question_date, bucket, before, page_size) for bucket in range(QUESTION_BUCKETS)],
+            concurrency=QUESTION_BUCKETS,
+        )
+        merged = heapq.merge(
+            *(list(result) for _, result in results),
+            key=lambda row: row.created_at.time,
+            reverse=True,
+        )
+        rows = list(islice(merged, page_size))
+        return [self._question(row) for row in rows], _next_cursor(rows, page_size)
+
+    def get_answers_by_question(self, question_id, page_size=DEFAULT_PAGE_SIZE, cursor=None):
         if isinstance(question_id, str):
             question_id = UUID(question_id)
             
-        query = "SELECT * FROM answers_by_question WHERE question_id = %s"
-        rows = self.session.execute(query, (question_id,))
+        rows, next_cursor = self._keyset_page("answers_by_question", (question_id,), page_size, cursor)
         
-        return [
-            {
-                "answer_id": str(row.answer_id),
-                "user_id": row.user_id,
-                "text": row.answer_text,
-                "answer_date": str(row.answer_date)
-            }
-            for row in rows
-        ]
+        return [self._answer(row) for row in rows], next_cursor
     
     def get_answers_by_question_and_date(self, question_id, answer_date: date):
         if isinstance(question_id, str):
             question_id = UUID(question_id)
             
-        query = "SELECT * FROM answers_by_question WHERE question_id = %s AND answer_date = %s"
-        rows = self.session.execute(query, (question_id, answer_date))
+        rows = self.session.execute(self.stmts["answers_by_question_and_date"], (question_id, answer_date))
         
-        return [
-            {
-                "answer_id": str(row.answer_id),
-                "user_id": row.user_id,
-                "text": row.answer_text,
-                "answer_date": str(row.answer_date)
-            }
-            for row in rows
-        ]
+        return [self._answer(row) for row in rows]
 
     # =========================
     # Helper: klausimai su atsakymais
     # =========================
 
-    def get_questions_with_answers(self, limit=50):
-        """Get questions with their answers."""
-        questions = self.get_questions_all(limit)
-        
-        for q in questions:
-            q["answers"] = self.get_answers_by_question(q["question_id"])
+    def get_questions_with_answers(self, limit=50, answers_limit=DEFAULT_PAGE_SIZE,
+                                   concurrency=ANSWERS_CONCURRENCY):
+        """
+        Get questions with their answers.
+
+        Answer partitions are read concurrently (at most `concurrency` in flight)
+        with one prepared statement, so latency follows the slowest partition
+        instead of the sum of N sequential reads.
+        """
+        questions, _ = self.get_questions_all(page_size=limit)
+
+        results = execute_concurrent_with_args(
+            self.session,
+            self.stmts["answers_by_question_limited"],
+            [(UUID(q["question_id"]), answers_limit) for q in questions],
+            concurrency=concurrency,
+            raise_on_first_error=False,
+        )
+        for q, (success, result) in zip(questions, results):
+            if not success:
+                print(f"⚠️ Failed to load answers for question {q['question_id']}: {result}")
+                q["answers"] = []
+                continue
+            q["answers"] = [self._answer(row) for row in result]
         
         return questions
 
@@ -1,16 +1,37 @@
 import clickhouse_connect
+import time
 from pathlib import Path
 import yaml 
 from datetime import datetime, timezone
 from decimal import Decimal
-from typing import Any, Dict, Optional
+from typing import Any, Dict, List, Optional
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
+# Bilietų likučiai kaip versijuotas append-only žurnalas: kiekvienas pirkimas
+# prideda eilutę, o ReplacingMergeTree fone palieka naujausią versiją.
+INVENTORY_TABLE = "renginio_bilietu_likuciai"
+INVENTORY_COLS = ["event_id", "bilieto_tipas_id", "likutis", "version"]
+INVENTORY_TABLE_DDL = """
+CREATE TABLE IF NOT EXISTS {db}.renginio_bilietu_likuciai (
+  event_id String,
+  bilieto_tipas_id String,
+  likutis Int32,
+  version UInt64,
+  ingested_at DateTime DEFAULT now()
+) ENGINE = ReplacingMergeTree(version) ORDER BY (event_id, bilieto_tipas_id)
+"""
+
+
 class ClickHouseClient():
-    def __init__(self) -> None:
+    def __init__(self, async_insert: bool = False) -> None:
         self.client = self.connect()
         self.ch_db = "default"  # Database name
+        # Serverio async insert: smulkius insert'us ClickHouse sujungia į didesnius part'us,
+        # o wait_for_async_insert atsako tik įrašius (Outbox'ui reikia "ack = įrašyta")
+        self.insert_settings = (
+            {"async_insert": 1, "wait_for_async_insert": 1} if async_insert else None
+        )
 
     def connect(self):
         with open(PROJECT_ROOT / 'creds.yml', 'r') as f:
@@ -54,6 +75,10 @@ class ClickHouseClient():
             return str(x["$oid"])
         return str(x) if x is not None else ""
     
+    def _insert(self, table: str, rows: List[list], column_names: List[str]) -> None:
+        """Insert rows; returns once the server has written them (errors propagate)."""
+        self.client.insert(table, rows, column_names=column_names, settings=self.insert_settings)
+
     # ============================================
     # REAL-TIME SYNC FUNCTIONS (NEW)
     # ============================================
@@ -81,7 +106,7 @@ class ClickHouseClient():
             str(user_doc.get("Slaptazodis", ""))
         ]]
         
-        self.client.insert(
+        self._insert(
             f"{self.ch_db}.vartotojai",
             user_data,
             column_names=["user_id", "vardas", "pavarde", "gimimo_data", 
@@ -97,7 +122,7 @@ class ClickHouseClient():
         
         if pomegiai:
             hobby_data = [[user_id, str(h)] for h in pomegiai]
-            self.client.insert(
+            self._insert(
                 f"{self.ch_db}.vartotojo_pomegiai",
                 hobby_data,
                 column_names=["user_id", "pomegis"]
@@ -133,7 +158,7 @@ class ClickHouseClient():
             ])
         
         if order_items:
-            self.client.insert(
+            self._insert(
                 f"{self.ch_db}.uzsakymai_bilietai",
                 order_items,
                 column_names=["order_id", "vartotojo_id", "uzsakymo_data",
@@ -141,24 +166,50 @@ class ClickHouseClient():
             )
             print(f"✅ Order synced: {order_id} with {len(order_items)} items")
     
-    def update_ticket_inventory(self, event_id: str, bilieto_tipas_id: str, new_likutis: int) -> None:
+    def ensure_schema(self) -> None:
+        """Create tables the real-time sync writes to (idempotent)."""
+        self.client.command(INVENTORY_TABLE_DDL.format(db=self.ch_db))
+
+    def update_ticket_inventory(self, event_id: str, bilieto_tipas_id: str, new_likutis: int,
+                                version: Optional[int] = None) -> None:
         """
-        Update ticket inventory in ClickHouse.
+        Record a new ticket inventory value in ClickHouse.
         Called after purchase updates ticket count in MongoDB.
+
+        This is a cheap append to the versioned inventory table;
+        read the current value with get_ticket_inventory().
         
         Args:
             event_id: Event ID
             bilieto_tipas_id: Ticket type ID
             new_likutis: New remaining ticket count
+            version: Ordering key (defaults to now in ns); the highest version wins
         """
         print(f"📤 Updating ticket inventory in ClickHouse: {event_id}/{bilieto_tipas_id} → {new_likutis}")
-        
-        # ClickHouse uses ALTER TABLE UPDATE for mutations
+
+        self._insert(
+            f"{self.ch_db}.{INVENTORY_TABLE}",
+            [[str(event_id), str(bilieto_tipas_id), int(new_likutis), int(version or time.time_ns())]],
+            column_names=INVENTORY_COLS
+        )
+
+    def get_ticket_inventory(self, event_id: Optional[str] = None) -> List[Dict]:
+        """
+        Latest remaining ticket count per (event_id, bilieto_tipas_id).
+
+        Uses argMax over the version column, so the result is correct even
+        before ReplacingMergeTree has merged the old versions away.
+        """
+        where = "WHERE event_id = {event_id:String}" if event_id is not None else ""
         query = f"""
-            ALTER TABLE {self.ch_db}.renginio_bilietu_tipai
-            UPDATE likutis = {new_likutis}
-            WHERE event_id = '{event_id}' AND bilieto_tipas_id = '{bilieto_tipas_id}'
+            SELECT event_id, bilieto_tipas_id, argMax(likutis, version) AS likutis
+            FROM {self.ch_db}.{INVENTORY_TABLE}
+            {where}
+            GROUP BY event_id, bilieto_tipas_id
+            ORDER BY event_id, bilieto_tipas_id
         """
-        
-        self.client.command(query)
-        print(f"✅ Ticket inventory updated")
\ No newline at end of file
+        rows = self.client.query(query, parameters={"event_id": event_id}).result_rows
+        return [
+            {"event_id": r[0], "bilieto_tipas_id": r[1], "likutis": int(r[2])}
+            for r in rows
+        ]
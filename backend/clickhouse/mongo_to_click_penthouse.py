@@ -1,3 +1,4 @@
+import time
 from datetime import datetime, timezone
 from decimal import Decimal
 from typing import Any, Dict, List, Optional
@@ -7,7 +8,9 @@ from bson.decimal128 import Decimal128
 
 # Your existing connectors
 from backend.mongas.db import MongoDB
-from backend.clickhouse.clickhouse import ClickHouseClient
+from backend.clickhouse.clickhouse import (
+    ClickHouseClient, INVENTORY_TABLE, INVENTORY_COLS, INVENTORY_TABLE_DDL
+)
 
 
 class MongoToClickHouseNormalizedImporter:
@@ -22,6 +25,7 @@ class MongoToClickHouseNormalizedImporter:
     def drop_all_tables(self) -> None:
         tables = [
             "uzsakymai_bilietai",
+            INVENTORY_TABLE,
             "renginio_bilietu_tipai",
             "renginiai",
             "vartotojo_pomegiai",
@@ -123,6 +127,9 @@ class MongoToClickHouseNormalizedImporter:
         ) ENGINE = MergeTree ORDER BY (event_id, bilieto_tipas_id)
         """)
 
+        # Einami likučiai (versijuoti; rašoma iš purchase per update_ticket_inventory)
+        self.ch.command(INVENTORY_TABLE_DDL.format(db=self.ch_db))
+
         self.ch.command(f"""
         CREATE TABLE IF NOT EXISTS {self.ch_db}.uzsakymai_bilietai (
           order_id String,
@@ -137,7 +144,7 @@ class MongoToClickHouseNormalizedImporter:
         """)
 
     def truncate_all(self) -> None:
-        for t in ["uzsakymai_bilietai", "renginio_bilietu_tipai", "renginiai", "vartotojai"]:
+        for t in ["uzsakymai_bilietai", "renginio_bilietu_tipai", INVENTORY_TABLE, "renginiai", "vartotojai"]:
             self.ch.command(f"TRUNCATE TABLE IF EXISTS {self.ch_db}.{t}")
 
     # ---------- import helpers ----------
@@ -206,6 +213,8 @@ class MongoToClickHouseNormalizedImporter:
 
         ev_buf: List[Dict[str, Any]] = []
         tt_buf: List[Dict[str, Any]] = []
+        inv_buf: List[Dict[str, Any]] = []
+        version = time.time_ns()
 
         for e in self.mongo.renginiai.find():
             event_id = self._id_str(e.get("_id"))
@@ -229,6 +238,12 @@ class MongoToClickHouseNormalizedImporter:
                     "kaina": self._to_decimal_2(b.get("Kaina")),
                     "likutis": int(b.get("Likutis", 0) or 0),
                 })
+                inv_buf.append({
+                    "event_id": event_id,
+                    "bilieto_tipas_id": str(b.get("Bilieto_tipas_id", "")),
+                    "likutis": int(b.get("Likutis", 0) or 0),
+                    "version": version,
+                })
 
             if len(ev_buf) >= self.batch_size:
                 self._insert("renginiai", ev_buf, self.EVENT_COLS)
@@ -236,10 +251,13 @@ class MongoToClickHouseNormalizedImporter:
 
             if len(tt_buf) >= self.batch_size:
                 self._insert("renginio_bilietu_tipai", tt_buf, self.TICKET_TYPE_COLS)
+                self._insert(INVENTORY_TABLE, inv_buf, INVENTORY_COLS)
                 tt_buf.clear()
+                inv_buf.clear()
 
         self._insert("renginiai", ev_buf, self.EVENT_COLS)
         self._insert("renginio_bilietu_tipai", tt_buf, self.TICKET_TYPE_COLS)
+        self._insert(INVENTORY_TABLE, inv_buf, INVENTORY_COLS)
 
     def import_order_items_only(self) -> None:
         print("Importing order line items (uzsakymai_bilietai) ...")
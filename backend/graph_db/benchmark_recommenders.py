@@ -0,0 +1,66 @@
+from backend.mongas.db import MongoDB
+from backend.graph_db.graph import GraphDB
+from backend.graph_db.sparse_recommender import SparseRecommender
+import argparse
+import random
+import statistics
+import time
+
+
+def timed(fn, user_ids):
+    """Call fn(user_id) for every user; returns (latencies in ms, results)."""
+    latencies, results = [], []
+    for user_id in user_ids:
+        started = time.perf_counter()
+        results.append(fn(user_id))
+        latencies.append((time.perf_counter() - started) * 1000)
+    return latencies, results
+
+
+def summary(name, latencies):
+    latencies = sorted(latencies)
+    p95 = latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))]
+    print(f"{name:<28} mean {statistics.mean(latencies):9.3f} ms   "
+          f"p50 {statistics.median(latencies):9.3f} ms   p95 {p95:9.3f} ms")
+
+
+def overlap(a, b):
+    """Share of recommended event ids the two engines agree on (order ignored)."""
+    ids_a = {e["event_id"] for e in a or []}
+    ids_b = {e["event_id"] for e in b or []}
+    if not ids_a and not ids_b:
+        return 1.0
+    return len(ids_a & ids_b) / max(len(ids_a), len(ids_b))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Cypher vs. SciPy sparse recommender latency")
+    parser.add_argument("--users", type=int, default=200, help="sample size (buyers)")
+    parser.add_argument("--seed", type=int, default=42)
+    args = parser.parse_args()
+
+    neo = GraphDB()
+    sparse = SparseRecommender(MongoDB())
+
+    started = time.perf_counter()
+    model = sparse.refresh()
+    print(f"Matrix build: {(time.perf_counter() - started) * 1000:.1f} ms")
+
+    random.seed(args.seed)
+    user_ids = list(model.user_index)
+    user_ids = random.sample(user_ids, min(args.users, len(user_ids)))
+    if not user_ids:
+        raise SystemExit("No purchases found, nothing to benchmark")
+    print(f"Benchmarking {len(user_ids)} users\n")
+
+    for method in ("recommend_collaborative", "recommend_collaborative_upcoming"):
+        neo_lat, neo_res = timed(getattr(neo, method), user_ids)
+        sp_lat, sp_res = timed(getattr(sparse, method), user_ids)
+        print(method)
+        summary("  neo4j (Cypher)", neo_lat)
+        summary("  sparse (CSR)", sp_lat)
+        agree = statistics.mean(overlap(a, b) for a, b in zip(neo_res, sp_res))
+        print(f"  speedup x{statistics.median(neo_lat) / statistics.median(sp_lat):.0f}, "
+              f"result overlap {agree:.0%}\n")
+
+    neo.close()
@@ -1,44 +1,196 @@
-from neo4j import GraphDatabase
+from neo4j import GraphDatabase, AsyncGraphDatabase, Query, unit_of_work
 from pathlib import Path
+from datetime import datetime, timezone
 import yaml
 from neo4j import GraphDatabase
 from pathlib import Path
 import yaml
-import json
-from collections import Counter
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
+# Constraint'ai ir indeksai, kurių reikia MATCH/MERGE užklausoms (pavadinimas -> DDL)
+SCHEMA = {
+    "user_id_unique":
+        "CREATE CONSTRAINT user_id_unique IF NOT EXISTS FOR (u:User) REQUIRE u.id IS UNIQUE",
+    "event_id_unique":
+        "CREATE CONSTRAINT event_id_unique IF NOT EXISTS FOR (e:Event) REQUIRE e.id IS UNIQUE",
+    "event_data":
+        "CREATE RANGE INDEX event_data IF NOT EXISTS FOR (e:Event) ON (e.data)",
+    "organizer_key_unique":
+        "CREATE CONSTRAINT organizer_key_unique IF NOT EXISTS FOR (o:Organizer) REQUIRE o.key IS UNIQUE",
+    "bought_order_item_id":
+        "CREATE INDEX bought_order_item_id IF NOT EXISTS FOR ()-[r:BOUGHT]-() ON (r.order_item_id)",
+}
+
+# Renginio laukai, kuriuos grąžina rekomendacijų užklausos (map projection ant `rec`)
+EVENT_PROJECTION = """rec {
+    event_id: rec.id,
+    event_date: rec.data,
+    title: rec.pavadinimas,
+    type: rec.tipas,
+    address: rec.adresas,
+    city: rec.miestas,
+    venue: rec.vieta,
+    age_restriction: rec.amziaus_cenzas,
+    duration: rec.renginio_trukme,
+    ticket_types: rec.bilieto_tipai,
+    organizers: rec.organizatoriai
+}"""
+
+
+def to_neo_datetime(value):
+    """
+    Event date (datetime / ISO string / {"$date": ...}) -> timezone-aware datetime,
+    stored by the driver as a native ZONED DATETIME. Naive values are UTC (as in Mongo).
+    """
+    if isinstance(value, dict):
+        value = value.get("$date")
+    if isinstance(value, (int, float)):
+        value = datetime.fromtimestamp(value / 1000, tz=timezone.utc)
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return None
+    if not isinstance(value, datetime):
+        return None
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value
+
+
+def order_item_id(order_id, index=0):
+    """BOUGHT relationship key: one edge per order line (`<order id>-<line index>`)."""
+    return f"{order_id}-{index}"
+
 
 class GraphDB():
-    def __init__(self):
+    def __init__(self, max_pool_size=100, acquisition_timeout=60.0, query_timeout=None,
+                 max_retry_time=30.0, database="neo4j"):
+        self.max_pool_size = max_pool_size
+        self.acquisition_timeout = acquisition_timeout
+        self.query_timeout = query_timeout
+        self.max_retry_time = max_retry_time
+        self.database = database
         self.driver = self.connect()
-        self.session = self.driver.session(database="neo4j")
+        self._async_driver = None
         print("✅ Connected to Neo4j database")
 
-    def connect(self):
+    def _load_creds(self):
         with open(PROJECT_ROOT / 'creds.yml', 'r') as f:
             data = yaml.safe_load(f) or {}
-        creds = data.get('neo4j_user', data)
+        return data.get('neo4j_user', data)
+
+    def _driver_config(self):
+        return {
+            "max_connection_pool_size": self.max_pool_size,
+            "connection_acquisition_timeout": self.acquisition_timeout,
+            "max_transaction_retry_time": self.max_retry_time,
+            # patikrinam ilgiau nenaudotą jungtį prieš ją duodant (vietoj 'defunct connection')
+            "liveness_check_timeout": 30.0,
+        }
+
+    def connect(self):
+        creds = self._load_creds()
 
         driver = GraphDatabase.driver(
             creds['uri'],
-            auth=(creds['username'], creds['password'])
+            auth=(creds['username'], creds['password']),
+            **self._driver_config()
         )
         return driver
 
+    def close(self):
+        self.driver.close()
+
+    # -------------------------
+    # Query helpers
+    # -------------------------
+    def _unit_of_work(self, query, params, timeout):
+        timeout = timeout if timeout is not None else self.query_timeout
+
+        @unit_of_work(timeout=timeout)
+        def work(tx):
+            return [record.data() for record in tx.run(query, params or {})]
+        return work
+
+    def read(self, query, params=None, timeout=None):
+        """
+        Run a read query in a managed transaction (execute_read).
+        Routed to a reader on a cluster; transient errors are retried by the driver.
+        """
+        with self.driver.session(database=self.database) as session:
+            return session.execute_read(self._unit_of_work(query, params, timeout))
+
+    def write(self, query, params=None, timeout=None):
+        """Run a write query in a managed transaction (execute_write, retried on transient errors)."""
+        with self.driver.session(database=self.database) as session:
+            return session.execute_write(self._unit_of_work(query, params, timeout))
 
     def _run_query(self, query, params=None):
         """
-        Execute query and return results.
+        Execute query in an auto-commit transaction and return results.
 
-        IMPORTANT: we open a NEW session per call to avoid 'defunct connection'
-        errors when a long-lived session goes stale.
+        Only for statements that cannot run inside a managed transaction
+        (schema DDL, CALL { ... } IN TRANSACTIONS); use read()/write() otherwise.
+        Sessions are cheap: connections come from the driver's pool.
         """
-        with self.driver.session(database="neo4j") as session:
-            result = session.run(query, params or {})
+        with self.driver.session(database=self.database) as session:
+            result = session.run(Query(query, timeout=self.query_timeout), params or {})
             return [record.data() for record in result]
 
+    # -------------------------
+    # Async path (pasirenkamas, pvz. asyncio worker'iams)
+    # -------------------------
+    def async_driver(self):
+        """Lazily created AsyncDriver with the same pool settings."""
+        if self._async_driver is None:
+            creds = self._load_creds()
+            self._async_driver = AsyncGraphDatabase.driver(
+                creds['uri'],
+                auth=(creds['username'], creds['password']),
+                **self._driver_config()
+            )
+        return self._async_driver
+
+    async def aread(self, query, params=None, timeout=None):
+        async with self.async_driver().session(database=self.database) as session:
+            return await session.execute_read(self._async_unit_of_work(query, params, timeout))
+
+    async def awrite(self, query, params=None, timeout=None):
+        async with self.async_driver().session(database=self.database) as session:
+            return await session.execute_write(self._async_unit_of_work(query, params, timeout))
+
+    def _async_unit_of_work(self, query, params, timeout):
+        timeout = timeout if timeout is not None else self.query_timeout
+
+        @unit_of_work(timeout=timeout)
+        async def work(tx):
+            result = await tx.run(query, params or {})
+            return [record.data() async for record in result]
+        return work
+
+
+    # -------------------------
+    # Schema
+    # -------------------------
+    def ensure_schema(self):
+        """Create uniqueness constraints and indexes (idempotent)."""
+        for name, ddl in SCHEMA.items():
+            try:
+                self._run_query(ddl)
+            except Exception as e:
+                # pvz. dublikatai neleidžia sukurti unique constraint'o
+                print(f"⚠️ Neo4j schema '{name}' could not be created: {e}")
+
+    def verify_schema(self):
+        """Return names of expected indexes/constraints that are missing or not ONLINE."""
+        rows = self._run_query("SHOW INDEXES YIELD name, state")
+        states = {r["name"]: r["state"] for r in rows}
+        problems = [name for name in SCHEMA if states.get(name) != "ONLINE"]
+        for name in problems:
+            print(f"⚠️ Neo4j index '{name}' is {states.get(name, 'MISSING')}")
+        return problems
 
     def has_purchase_history(self, user_id):
         """Check if user has any purchase history"""
@@ -46,78 +198,264 @@ class GraphDB():
             MATCH (u:User {id: $user_id})-[:BOUGHT]->(:Event)
             RETURN count(*) as purchase_count
         """
-        result = self._run_query(query, {'user_id': user_id})
+        result = self.read(query, {'user_id': user_id})
         return result[0]['purchase_count'] > 0 if result else False
 
-    def add_purchase(self, user_id, event_id, event_date=None):
-        """Record purchase relationship between user and event"""
+    def co_buyers(self, event_id, limit=1000):
+        """Users who bought the given event"""
         query = """
-            MERGE (u:User {id: $user_id})   
-            MERGE (e:Event {id: $event_id}) 
-            MERGE (u)-[p:BOUGHT]->(e)      
-            ON CREATE SET p.timestamp = timestamp() 
+            MATCH (:Event {id: $event_id})<-[:BOUGHT]-(u:User)
+            RETURN DISTINCT u.id AS user_id
+            LIMIT $limit
         """
-        if event_date:
-            query += " SET e.data = datetime($event_date)"
+        rows = self.read(query, {'event_id': event_id, 'limit': limit})
+        return [r['user_id'] for r in rows]
 
-        return self._run_query(query, {
+    def add_purchase(self, user_id, event_id, event_date=None, order_id=None, item_index=0):
+        """
+        Record purchase relationship between user and event.
+
+        The BOUGHT edge is keyed by order_item_id (same key as the Mongo importer),
+        so replaying the purchase or importing the order later does not add a
+        second edge. On the user's first purchase of this event, the CO_BOUGHT
+        weight between it and every other event the user bought is incremented
+        (both directions) and stamped with rebuilt_at, so a concurrent
+        rebuild_co_purchases does not remove it. event_date is stored as a
+        native temporal value (see to_neo_datetime).
+        """
+        event_date = to_neo_datetime(event_date)
+        set_date = "SET e.data = $event_date" if event_date else ""
+        # senos Outbox užduotys (be order_id) -> vienas BOUGHT be rakto
+        bought = "[p:BOUGHT {order_item_id: $order_item_id}]" if order_id else "[p:BOUGHT]"
+        query = f"""
+            MERGE (u:User {{id: $user_id}})
+            MERGE (e:Event {{id: $event_id}})
+            WITH u, e, EXISTS {{ (u)-[:BOUGHT]->(e) }} AS already_bought
+            MERGE (u)-{bought}->(e)
+            ON CREATE SET p.timestamp = timestamp(), p.uzsakymo_id = $order_id
+            {set_date}
+            WITH u, e, already_bought
+            WHERE NOT already_bought
+            MATCH (u)-[:BOUGHT]->(other:Event)
+            WHERE other <> e
+            WITH DISTINCT e, other
+            MERGE (e)-[c1:CO_BOUGHT]->(other)
+            ON CREATE SET c1.weight = 0
+            SET c1.weight = c1.weight + 1, c1.rebuilt_at = timestamp()
+            MERGE (other)-[c2:CO_BOUGHT]->(e)
+            ON CREATE SET c2.weight = 0
+            SET c2.weight = c2.weight + 1, c2.rebuilt_at = timestamp()
+        """
+
+        return self.write(query, {
             'user_id': user_id,
             'event_id': event_id,
-            'event_date': event_date
+            'event_date': event_date,
+            'order_id': order_id,
+            'order_item_id': order_item_id(order_id, item_index) if order_id else None,
         })
 
+    def refresh_co_purchases(self, event_ids):
+        """
+        Recompute CO_BOUGHT weights of the given events only (both directions)
+        and remove their edges to events no user bought together any more.
+        Used by the incremental sync after BOUGHT edges were added or deleted.
+        """
+        if not event_ids:
+            return
+        self.write("""
+            UNWIND $event_ids AS id
+            MATCH (a:Event {id: id})
+            CALL {
+                WITH a
+                MATCH (a)<-[:BOUGHT]-(u:User)-[:BOUGHT]->(b:Event)
+                WHERE a <> b
+                WITH a, b, count(DISTINCT u) AS w
+                MERGE (a)-[c1:CO_BOUGHT]->(b)
+                SET c1.weight = w, c1.rebuilt_at = timestamp()
+                MERGE (b)-[c2:CO_BOUGHT]->(a)
+                SET c2.weight = w, c2.rebuilt_at = timestamp()
+            }
+            CALL {
+                WITH a
+                MATCH (a)-[c:CO_BOUGHT]-(b:Event)
+                WHERE NOT EXISTS { (a)<-[:BOUGHT]-(:User)-[:BOUGHT]->(b) }
+                DELETE c
+            }
+        """, {"event_ids": list(event_ids)})
+
+    def rebuild_co_purchases(self):
+        """
+        Full rebuild of (:Event)-[:CO_BOUGHT {weight}]->(:Event), where weight is
+        the number of distinct users who bought both events. Existing edges are
+        overwritten in place and stale ones removed afterwards, so recommendations
+        keep working while it runs.
+
+        An edge is stale only if it was last written before the rebuild started
+        (add_purchase stamps rebuilt_at too) and its two events no longer share
+        a buyer, so purchases recorded during the rebuild are kept.
+        """
+        # tas pats (writer'io) laikrodis, kuriuo add_purchase žymi rebuilt_at
+        stamp = self._run_query("RETURN timestamp() AS ts")[0]["ts"]
+        self._run_query("""
+            MATCH (a:Event)
+            CALL {
+                WITH a
+                MATCH (a)<-[:BOUGHT]-(u:User)-[:BOUGHT]->(b:Event)
+                WHERE a <> b
+                WITH a, b, count(DISTINCT u) AS w
+                MERGE (a)-[c:CO_BOUGHT]->(b)
+                SET c.weight = w, c.rebuilt_at = $stamp
+            } IN TRANSACTIONS OF 100 ROWS
+        """, {"stamp": stamp})
+        self._run_query("""
+            MATCH (a:Event)-[c:CO_BOUGHT]->(b:Event)
+            WHERE (c.rebuilt_at IS NULL OR c.rebuilt_at < $stamp)
+              AND NOT EXISTS { (a)<-[:BOUGHT]-(:User)-[:BOUGHT]->(b) }
+            CALL { WITH c DELETE c } IN TRANSACTIONS OF 10000 ROWS
+        """, {"stamp": stamp})
+
     # -------------------------
     # Event recommendations
     # -------------------------
-    def recommend_collaborative(self, user_id):
-        """All recommended events based on similar users"""
-        query = """
-            MATCH (u:User {id: $user_id})-[:BOUGHT]->(e:Event) 
-            MATCH (other:User)-[:BOUGHT]->(e)  
-            MATCH (other)-[:BOUGHT]->(rec:Event)
-            WHERE NOT (u)-[:BOUGHT]->(rec)      
-            WITH rec, COUNT(DISTINCT other) as similarity_score 
-            ORDER BY similarity_score DESC  
-            LIMIT 10
-            RETURN rec.id as event_id,
-                   rec.data as event_date,
-                   rec.pavadinimas as title,
-                   rec.tipas as type,
-                   rec.adresas as address,
-                   rec.miestas as city,
-                   rec.vieta as venue,
-                   rec.amziaus_cenzas as age_restriction,
-                   rec.renginio_trukme as duration,
-                   rec.bilieto_tipai as ticket_types,
-                   rec.organizatoriai as organizers
-        """
-        return self._run_query(query, {'user_id': user_id})
-
-    def recommend_collaborative_upcoming(self, user_id):
-        """Upcoming recommended events only (24 months)"""
+    def recommend_collaborative(self, user_id, limit=10):
+        """
+        All recommended events based on similar users (one hop over CO_BOUGHT).
+
+        History check and recommendation run in one query: returns None when the
+        user has bought nothing (cold start), otherwise a list (possibly empty).
+        """
+        query = f"""
+            OPTIONAL MATCH (:User {{id: $user_id}})-[:BOUGHT]->(e:Event)
+            WITH collect(DISTINCT e) AS owned
+            CALL {{
+                WITH owned
+                UNWIND owned AS e
+                MATCH (e)-[c:CO_BOUGHT]->(rec:Event)
+                WHERE NOT rec IN owned
+                WITH rec, sum(c.weight) AS similarity_score
+                ORDER BY similarity_score DESC
+                LIMIT $limit
+                RETURN collect({EVENT_PROJECTION}) AS recs
+            }}
+            RETURN size(owned) > 0 AS has_history, recs
+        """
+        rows = self.read(query, {'user_id': user_id, 'limit': limit})
+        if not rows or not rows[0]['has_history']:
+            return None
+        return rows[0]['recs']
+
+    def recommend_collaborative_batch(self, user_ids, limit=10, batch_size=500):
+        """
+        recommend_collaborative for many users: one UNWIND query per chunk of
+        `batch_size` ids. Returns {user_id: [events]}, with None for users without
+        purchase history (as recommend_collaborative) and [] for no recommendations.
+        """
+        query = f"""
+            UNWIND $user_ids AS uid
+            CALL {{
+                WITH uid
+                OPTIONAL MATCH (:User {{id: uid}})-[:BOUGHT]->(e:Event)
+                RETURN collect(DISTINCT e) AS owned
+            }}
+            CALL {{
+                WITH owned
+                UNWIND owned AS e
+                MATCH (e)-[c:CO_BOUGHT]->(rec:Event)
+                WHERE NOT rec IN owned
+                WITH rec, sum(c.weight) AS similarity_score
+                ORDER BY similarity_score DESC
+                LIMIT $limit
+                RETURN collect({EVENT_PROJECTION}) AS recs
+            }}
+            RETURN uid AS user_id, size(owned) > 0 AS has_history, recs
+        """
+        user_ids = list(dict.fromkeys(user_ids))
+        result = {}
+        for i in range(0, len(user_ids), batch_size):
+            rows = self.read(query, {'user_ids': user_ids[i:i + batch_size], 'limit': limit})
+            for row in rows:
+                result[row['user_id']] = row['recs'] if row['has_history'] else None
+        return result
+
+    def users_with_purchases(self):
+        """Ids of all users that have at least one BOUGHT relationship"""
         query = """
-            MATCH (u:User {id: $user_id})-[:BOUGHT]->(e:Event)
-            MATCH (other:User)-[:BOUGHT]->(e)
-            MATCH (other)-[:BOUGHT]->(rec:Event)
-            WHERE NOT (u)-[:BOUGHT]->(rec)
-              AND datetime(rec.data) >= datetime() 
-              AND datetime(rec.data) <= datetime() + duration({months: 24})  
-            WITH rec, COUNT(DISTINCT other) as similarity_score
-            ORDER BY similarity_score DESC
-            LIMIT 5
-            RETURN rec.id as event_id,
-                   rec.data as event_date,
-                   rec.pavadinimas as title,
-                   rec.tipas as type,
-                   rec.adresas as address,
-                   rec.miestas as city,
-                   rec.vieta as venue,
-                   rec.amziaus_cenzas as age_restriction,
-                   rec.renginio_trukme as duration,
-                   rec.bilieto_tipai as ticket_types,
-                   rec.organizatoriai as organizers
-        """
-        return self._run_query(query, {'user_id': user_id})
+            MATCH (u:User)
+            WHERE EXISTS { (u)-[:BOUGHT]->(:Event) }
+            RETURN u.id AS user_id
+        """
+        return [r['user_id'] for r in self.read(query)]
+
+    def recommend_collaborative_upcoming(self, user_id, limit=5, months=24):
+        """
+        Upcoming recommended events only (next `months` months).
+        Returns None when the user has no purchase history (see recommend_collaborative).
+
+        Expands CO_BOUGHT from the user's (few) owned events, as recommend_collaborative,
+        and filters candidates against a date window computed once per query; a
+        range seek over all upcoming events would touch far more nodes.
+        """
+        query = f"""
+            OPTIONAL MATCH (:User {{id: $user_id}})-[:BOUGHT]->(e:Event)
+            WITH collect(DISTINCT e) AS owned
+            CALL {{
+                WITH owned
+                WITH owned, datetime() AS now
+                WITH owned, now, now + duration({{months: $months}}) AS until
+                UNWIND owned AS e
+                MATCH (e)-[c:CO_BOUGHT]->(rec:Event)
+                WHERE NOT rec IN owned
+                  AND rec.data >= now
+                  AND rec.data <= until
+                WITH rec, sum(c.weight) AS similarity_score
+                ORDER BY similarity_score DESC
+                LIMIT $limit
+                RETURN collect({EVENT_PROJECTION}) AS recs
+            }}
+            RETURN size(owned) > 0 AS has_history, recs
+        """
+        rows = self.read(query, {'user_id': user_id, 'limit': limit, 'months': months})
+        if not rows or not rows[0]['has_history']:
+            return None
+        return rows[0]['recs']
+
+    def get_upcoming_events(self, months=24, limit=5):
+        """Soonest events in the next `months` months (index range seek + index order on e.data)."""
+        query = f"""
+            MATCH (rec:Event)
+            WHERE rec.data >= datetime()
+              AND rec.data <= datetime() + duration({{months: $months}})
+            WITH rec
+            ORDER BY rec.data ASC
+            LIMIT $limit
+            RETURN {EVENT_PROJECTION} AS event
+        """
+        rows = self.read(query, {'months': months, 'limit': limit})
+        return [r['event'] for r in rows]
+
+    def normalize_event_dates(self):
+        """
+        One-off migration: convert Event.data stored as a string or LOCAL DATETIME
+        (older imports / add_purchase) to ZONED DATETIME, so range predicates and
+        the `event_data` index see every event. Returns the number of converted nodes.
+        Values without an offset are UTC, as in to_neo_datetime.
+        """
+        rows = self._run_query("""
+            MATCH (e:Event)
+            WHERE e.data IS :: STRING OR e.data IS :: LOCAL DATETIME
+            CALL {
+                WITH e
+                SET e.data = CASE
+                    WHEN e.data IS :: LOCAL DATETIME
+                        THEN datetime({datetime: e.data, timezone: 'UTC'})
+                    WHEN e.data =~ '.*(Z|[+-][0-9]{2}:?[0-9]{2})$' THEN datetime(e.data)
+                    ELSE datetime({datetime: localdatetime(e.data), timezone: 'UTC'})
+                END
+            } IN TRANSACTIONS OF 10000 ROWS
+            RETURN count(e) AS converted
+        """)
+        return rows[0]['converted'] if rows else 0
 
     # -------------------------
     # User management
@@ -150,7 +488,7 @@ class GraphDB():
 
         query += " RETURN u"
 
-        return self._run_query(query, params)
+        return self.write(query, params)
 
    
     # -------------------------
@@ -169,65 +507,53 @@ class GraphDB():
         - 2 hops -> other users
         - 3+ hops -> events/users further away, etc.
 
+        The walk is a breadth-first search over distinct nodes: each step goes
+        event -> buyers -> their events and keeps only events not seen yet, so
+        the cost grows with the number of reachable events, not paths.
+
         We then:
         - Exclude events this user already bought.
-        - Collect organizers from the remaining events.
-        - Count how often each (name, email) pair appears.
-        - Return top N organizers.
+        - Count, per (:Organizer), how many of the remaining events it organizes.
+        - Return top N organizers (aggregation and LIMIT happen in Cypher).
+
+        Returns None when the user has no purchase history (same query, no extra round trip).
+        """
+        # Renginiai yra nelyginiuose gyliuose (1, 3, 5, ...): vienas BFS žingsnis = 2 hop'ai
+        steps = max(0, (max_depth - 1) // 2)
+        bfs_step = """
+            CALL {
+                WITH visited, frontier
+                UNWIND frontier AS x
+                MATCH (x)<-[:BOUGHT]-(:User)-[:BOUGHT]->(y:Event)
+                WHERE NOT y IN visited
+                RETURN collect(DISTINCT y) AS next
+            }
+            WITH owned, visited + next AS visited, next AS frontier
         """
-        # NOTE: variable-length upper bound can't be parameterized, so we
-        # inject max_depth directly into the Cypher string.
         cypher = f"""
-            MATCH (u:User {{id: $user_id}})
-            MATCH p = (u)-[:BOUGHT*1..{max_depth}]-(rec:Event)
-            WHERE NOT (u)-[:BOUGHT]->(rec)
-            WITH DISTINCT rec
-            RETURN rec.organizatoriai AS organizers_json
+            OPTIONAL MATCH (:User {{id: $user_id}})-[:BOUGHT]->(e:Event)
+            WITH collect(DISTINCT e) AS owned
+            WITH owned, owned AS visited, owned AS frontier
+            {bfs_step * steps}
+            CALL {{
+                WITH owned, visited
+                UNWIND visited AS rec
+                WITH rec, owned
+                WHERE NOT rec IN owned
+                MATCH (o:Organizer)-[:ORGANIZES]->(rec)
+                WITH o, count(DISTINCT rec) AS score
+                ORDER BY score DESC
+                LIMIT $limit
+                RETURN collect({{
+                    name: CASE WHEN coalesce(o.name, '') = '' THEN 'Organizatorius' ELSE o.name END,
+                    email: coalesce(o.email, ''),
+                    score: score
+                }}) AS organizers
+            }}
+            RETURN size(owned) > 0 AS has_history, organizers
         """
 
-        rows = self._run_query(cypher, {"user_id": user_id})
-
-        counter = Counter()
-
-        for row in rows:
-            raw = row.get("organizers_json")
-            if not raw:
-                continue
-
-            try:
-                org_list = json.loads(raw)
-            except Exception:
-                # if parsing fails, skip this event
-                continue
-
-            # Sometimes it could be a single object instead of list
-            if isinstance(org_list, dict):
-                org_list = [org_list]
-
-            if not isinstance(org_list, list):
-                continue
-
-            for org in org_list:
-                if not isinstance(org, dict):
-                    continue
-                name = (org.get("Pavadinimas") or org.get("pavadinimas") or "").strip()
-                email = (org.get("El_pastas") or org.get("el_pastas") or "").strip()
-
-                # We need at least a name or an email to be useful
-                if not (name or email):
-                    continue
-
-                # Count organizers (unique by name+email)
-                key = (name, email)
-                counter[key] += 1
-
-        # Build sorted result
-        result = []
-        for (name, email), score in counter.most_common(limit):
-            result.append({
-                "name": name or "Organizatorius",
-                "email": email,
-                "score": int(score)
-            })
-        return result
-
+        rows = self.read(cypher, {"user_id": user_id, "limit": limit})
+        if not rows or not rows[0]["has_history"]:
+            return None
+        return rows[0]["organizers"]
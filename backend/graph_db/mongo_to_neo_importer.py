@@ -1,12 +1,116 @@
 from bson.decimal128 import Decimal128
+from pymongo.errors import OperationFailure
 from backend.mongas.db import MongoDB
-from backend.graph_db.graph import GraphDB
-from datetime import datetime
+from backend.graph_db.graph import GraphDB, to_neo_datetime, order_item_id
+from itertools import islice
+import argparse
+import json
+import time
+
+
+USERS_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (u:User {id: row.id})
+    SET u.vardas = row.vardas,
+        u.pavarde = row.pavarde,
+        u.miestas = row.miestas,
+        u.tel = row.tel,
+        u.gimimo_data = row.gimimo_data,
+        u.pomegiai = row.pomegiai
+"""
+
+EVENTS_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (ev:Event {id: row.id})
+    SET ev.pavadinimas = row.pavadinimas,
+        ev.miestas = row.miestas,
+        ev.adresas = row.adresas,
+        ev.vieta = row.vieta,
+        ev.tipas = row.tipas,
+        ev.data = row.data,
+        ev.renginio_trukme = row.renginio_trukme,
+        ev.amziaus_cenzas = row.amziaus_cenzas,
+        ev.bilieto_tipai = row.bilieto_tipai,
+        ev.organizatoriai = row.organizatoriai
+    WITH ev, row
+    OPTIONAL MATCH (ev)<-[old:ORGANIZES]-(:Organizer)
+    DELETE old
+    WITH DISTINCT ev, row
+    UNWIND row.organizers AS org
+    MERGE (o:Organizer {key: org.key})
+    SET o.name = org.name,
+        o.email = org.email
+    MERGE (o)-[:ORGANIZES]->(ev)
+"""
+
+ORDERS_CYPHER = """
+    UNWIND $rows AS row
+    MERGE (u:User {id: row.uid})
+    MERGE (e:Event {id: row.eid})
+    MERGE (u)-[r:BOUGHT {
+        order_item_id: row.order_item_id
+    }]->(e)
+    SET r.kiekis = row.kiekis,
+        r.kaina = row.kaina,
+        r.bilieto_tipas = row.tipas,
+        r.uzsakymo_id = row.uzsakymo_id,
+        r.uzsakymo_data = row.uzsakymo_data
+"""
+
+
+# Trynimai grąžina renginius, kurių CO_BOUGHT svoriai pasikeitė
+DELETE_USERS_CYPHER = """
+    UNWIND $ids AS id
+    MATCH (u:User {id: id})
+    OPTIONAL MATCH (u)-[:BOUGHT]->(e:Event)
+    WITH u, collect(DISTINCT e.id) AS event_ids
+    DETACH DELETE u
+    WITH event_ids
+    UNWIND event_ids AS event_id
+    RETURN DISTINCT event_id
+"""
+
+DELETE_EVENTS_CYPHER = """
+    UNWIND $ids AS id
+    MATCH (e:Event {id: id})
+    DETACH DELETE e
+"""
+
+DELETE_ORDERS_CYPHER = """
+    UNWIND $ids AS id
+    MATCH (:User)-[r:BOUGHT {uzsakymo_id: id}]->(e:Event)
+    DELETE r
+    RETURN DISTINCT e.id AS event_id
+"""
+
+# Atnaujintas užsakymas: trinam BOUGHT eilutes, kurių dokumente nebeliko
+PRUNE_ORDER_ITEMS_CYPHER = """
+    UNWIND $orders AS o
+    MATCH (:User)-[r:BOUGHT {uzsakymo_id: o.id}]->(e:Event)
+    WHERE NOT r.order_item_id IN o.items
+    DELETE r
+    RETURN DISTINCT e.id AS event_id
+"""
+
+# Change stream resume token'as saugomas pačiame grafe: išvalius grafą dingsta ir jis
+SYNC_STATE_ID = "mongo_to_neo"
+
+
+def chunks(iterable, size):
+    """Yield lists of up to `size` items from any iterable (e.g. a Mongo cursor)."""
+    it = iter(iterable)
+    while True:
+        chunk = list(islice(it, size))
+        if not chunk:
+            return
+        yield chunk
+
 
 class MongoToNeoImporter:
-    def __init__(self):
+    def __init__(self, batch_size=1000):
         self.mongo = MongoDB()
         self.neo = GraphDB()
+        self.batch_size = batch_size
 
     def convert_price(self, price):
         if isinstance(price, Decimal128):
@@ -15,163 +119,330 @@ class MongoToNeoImporter:
             return float(price["$numberDecimal"])
         return float(price)
 
-    def import_users(self):
-        print("Importing users...")
-        for u in self.mongo.vartotojai.find():
-
-            # konvertuojam gimimo datą
-            gimimo_data = None
-            if isinstance(u.get("Gimimo_data"), dict) and "$date" in u["Gimimo_data"]:
-                gimimo_data = u["Gimimo_data"]["$date"]
-
-            # telefono nr.
-            tel = None
-            if isinstance(u.get("Tel_numeris"), dict) and "$numberLong" in u["Tel_numeris"]:
-                tel = u["Tel_numeris"]["$numberLong"]
-
-            p = u.get("Pomegiai", [])
-
-            if isinstance(p, dict):
-                pomegiai = list(p.values())
-            elif isinstance(p, list):
-                pomegiai = p
-            else:
-                pomegiai = []
-
-
-            self.neo.session.run("""
-                MERGE (u:User {id: $id})
-                SET u.vardas = $vardas,
-                    u.pavarde = $pavarde,
-                    u.miestas = $miestas,
-                    u.tel = $tel,
-                    u.gimimo_data = $gimimo_data,
-                    u.pomegiai = $pomegiai
-            """, {
-                "id": u["_id"],
-                "vardas": u.get("Vardas", ""),
-                "pavarde": u.get("Pavarde", ""),
-                "miestas": u.get("Miestas", ""),
-                "tel": tel,
-                "gimimo_data": gimimo_data,
-                "pomegiai": pomegiai
-            })
+    # -------------------------
+    # Mongo dokumentas -> Cypher parametrai
+    # -------------------------
+    def user_row(self, u):
+        # konvertuojam gimimo datą
+        gimimo_data = None
+        if isinstance(u.get("Gimimo_data"), dict) and "$date" in u["Gimimo_data"]:
+            gimimo_data = u["Gimimo_data"]["$date"]
 
+        # telefono nr.
+        tel = None
+        if isinstance(u.get("Tel_numeris"), dict) and "$numberLong" in u["Tel_numeris"]:
+            tel = u["Tel_numeris"]["$numberLong"]
 
-    def import_events(self):
-        print("Importing events...")
+        p = u.get("Pomegiai", [])
 
-        for e in self.mongo.renginiai.find():
+        if isinstance(p, dict):
+            pomegiai = list(p.values())
+        elif isinstance(p, list):
+            pomegiai = p
+        else:
+            pomegiai = []
 
-            import json
+        return {
+            "id": u["_id"],
+            "vardas": u.get("Vardas", ""),
+            "pavarde": u.get("Pavarde", ""),
+            "miestas": u.get("Miestas", ""),
+            "tel": tel,
+            "gimimo_data": gimimo_data,
+            "pomegiai": pomegiai
+        }
 
-            # konvertuojam datą
-            data = None
-            raw_data = e.get("Data")
-            if isinstance(raw_data, dict) and "$date" in raw_data:
-                data = raw_data["$date"]  # senas JSON style
-            elif isinstance(raw_data, datetime):
-                data = raw_data  # tikras datetime objektas
+    def event_row(self, e):
+        # data -> native ZONED DATETIME (datetime / ISO string / senas {"$date": ...})
+        data = to_neo_datetime(e.get("Data"))
 
-            # konvertuojam bilietų tipus -> JSON string
-            bilietu_tipai = []
-            for b in e.get("Bilieto_tipas", []):
-                bilietu_tipai.append({
-                    "Bilieto_tipas_id": b.get("Bilieto_tipas_id"),
-                    "Kaina": float(b.get("Kaina", 0)),
-                    "Likutis": int(b.get("Likutis", 0))
-                })
-            bilietu_tipai = json.dumps(bilietu_tipai)
+        # konvertuojam bilietų tipus -> JSON string
+        bilietu_tipai = []
+        for b in e.get("Bilieto_tipas", []):
+            bilietu_tipai.append({
+                "Bilieto_tipas_id": b.get("Bilieto_tipas_id"),
+                "Kaina": float(b.get("Kaina", 0)),
+                "Likutis": int(b.get("Likutis", 0))
+            })
 
+        return {
+            "id": e["_id"],
+            "pavadinimas": e.get("Pavadinimas", ""),
+            "miestas": e.get("Miestas", ""),
+            "adresas": e.get("Adresas", ""),
+            "vieta": e.get("Vieta", ""),
+            "tipas": e.get("Tipas", ""),
+            "data": data,
+            "renginio_trukme": e.get("Renginio_trukme"),
+            "amziaus_cenzas": e.get("Amziaus_cenzas"),
+            "bilieto_tipai": json.dumps(bilietu_tipai),
             # organizatoriai -> JSON string
-            organizatoriai = json.dumps(e.get("Organizatorius", []))
-
-            self.neo.session.run("""
-            MERGE (ev:Event {id: $id})
-            SET ev.pavadinimas = $pavadinimas,
-                ev.miestas = $miestas,
-                ev.adresas = $adresas,
-                ev.vieta = $vieta,
-                ev.tipas = $tipas,
-                ev.data = datetime($data),
-                ev.renginio_trukme = $renginio_trukme,
-                ev.amziaus_cenzas = $amziaus_cenzas,
-                ev.bilieto_tipai = $bilieto_tipai,
-                ev.organizatoriai = $organizatoriai
-            """, {
-                "id": e["_id"],
-                "pavadinimas": e.get("Pavadinimas", ""),
-                "miestas": e.get("Miestas", ""),
-                "adresas": e.get("Adresas", ""),
-                "vieta": e.get("Vieta", ""),
-                "tipas": e.get("Tipas", ""),
-                "data": data.isoformat() if data else None,
-                "renginio_trukme": e.get("Renginio_trukme"),
-                "amziaus_cenzas": e.get("Amziaus_cenzas"),
-                "bilieto_tipai": bilietu_tipai,
-                "organizatoriai": organizatoriai
+            "organizatoriai": json.dumps(e.get("Organizatorius", [])),
+            # (:Organizer)-[:ORGANIZES]->(:Event)
+            "organizers": self.organizer_rows(e.get("Organizatorius", []))
+        }
+
+    def organizer_rows(self, raw):
+        """Organizatorius (list or single object) -> [{key, name, email}], unique by name+email."""
+        # Sometimes it could be a single object instead of list
+        if isinstance(raw, dict):
+            raw = [raw]
+        if not isinstance(raw, list):
+            return []
+
+        rows = {}
+        for org in raw:
+            if not isinstance(org, dict):
+                continue
+            name = (org.get("Pavadinimas") or org.get("pavadinimas") or "").strip()
+            email = (org.get("El_pastas") or org.get("el_pastas") or "").strip()
+
+            # We need at least a name or an email to be useful
+            if not (name or email):
+                continue
+
+            key = f"{name}|{email}"
+            rows[key] = {"key": key, "name": name, "email": email}
+        return list(rows.values())
+
+    def order_rows(self, o):
+        user_id = o.get("vartotojo_id")
+
+        # konvertuojam užsakymo datą
+        uzsakymo_data = None
+        if isinstance(o.get("uzsakymo_data"), dict) and "$date" in o["uzsakymo_data"]:
+            uzsakymo_data = o["uzsakymo_data"]["$date"]
+
+        uzsakymo_id = str(o["_id"]["$oid"]) if isinstance(o["_id"], dict) else str(o["_id"])
+
+        # po vieną eilutę kiekvienam bilietui
+        rows = []
+        for index, b in enumerate(o.get("Bilietai", [])):
+            rows.append({
+                "uid": user_id,
+                "eid": b["renginys_id"],
+                # generate unique relationship ID
+                "order_item_id": order_item_id(uzsakymo_id, index),
+                "kiekis": b.get("Kiekis", 1),
+                "kaina": self.convert_price(b["Kaina"]),
+                "tipas": b.get("Bilieto_tipas_id"),
+                "uzsakymo_id": uzsakymo_id,
+                "uzsakymo_data": uzsakymo_data
             })
+        return rows
+
+    # -------------------------
+    # Batch rašymas: vienas UNWIND per chunk'ą, managed write transakcijoje
+    # -------------------------
+    def _write(self, cypher, rows):
+        if not rows:
+            return
+        self.neo.write(cypher, {"rows": rows})
+
+    def write_users(self, rows):
+        self._write(USERS_CYPHER, rows)
+
+    def write_events(self, rows):
+        self._write(EVENTS_CYPHER, rows)
+
+    def write_orders(self, rows):
+        self._write(ORDERS_CYPHER, rows)
+
+    def import_users(self):
+        print("Importing users...")
+        cursor = self.mongo.vartotojai.find().batch_size(self.batch_size)
+        for chunk in chunks(cursor, self.batch_size):
+            self.write_users([self.user_row(u) for u in chunk])
 
+    def import_events(self):
+        print("Importing events...")
+        cursor = self.mongo.renginiai.find().batch_size(self.batch_size)
+        for chunk in chunks(cursor, self.batch_size):
+            self.write_events([self.event_row(e) for e in chunk])
 
     def import_orders(self):
         print("Importing orders...")
+        cursor = self.mongo.uzsakymai.find().batch_size(self.batch_size)
+        rows = (row for o in cursor for row in self.order_rows(o))
+        for chunk in chunks(rows, self.batch_size):
+            self.write_orders(chunk)
 
-        for o in self.mongo.uzsakymai.find():
-            user_id = o.get("vartotojo_id")
+    def import_all(self):
+        """Upsert every user, event and order (MERGE, nothing is deleted)."""
+        self.import_users()
+        self.import_events()
+        self.import_orders()
 
-            # konvertuojam užsakymo datą
-            uzsakymo_data = None
-            if isinstance(o.get("uzsakymo_data"), dict) and "$date" in o["uzsakymo_data"]:
-                uzsakymo_data = o["uzsakymo_data"]["$date"]
+    # -------------------------
+    # Inkrementinis sync (Mongo change stream)
+    # -------------------------
+    def _watch(self, resume_token=None):
+        collections = [c.name for c in (self.mongo.vartotojai, self.mongo.renginiai, self.mongo.uzsakymai)]
+        pipeline = [{"$match": {
+            "ns.coll": {"$in": collections},
+            "operationType": {"$in": ["insert", "update", "replace", "delete"]},
+        }}]
+        return self.mongo.db.watch(
+            pipeline,
+            full_document="updateLookup",
+            resume_after=resume_token,
+            batch_size=self.batch_size,
+        )
 
-            uzsakymo_id = str(o["_id"]["$oid"]) if isinstance(o["_id"], dict) else str(o["_id"])
+    def load_resume_token(self):
+        rows = self.neo.read(
+            "MATCH (s:SyncState {id: $id}) RETURN s.resume_token AS token",
+            {"id": SYNC_STATE_ID}
+        )
+        token = rows[0]["token"] if rows else None
+        return {"_data": token} if token else None
 
-            # užtikrinam, kad user node egzistuoja
-            self.neo.session.run("MERGE (u:User {id: $uid})", {"uid": user_id})
+    def save_resume_token(self, token):
+        if not token:
+            return
+        self.neo.write("""
+            MERGE (s:SyncState {id: $id})
+            SET s.resume_token = $token,
+                s.updated_at = datetime()
+        """, {"id": SYNC_STATE_ID, "token": token["_data"]})
 
-            # einam per bilietus
-            for index, b in enumerate(o.get("Bilietai", [])):
+    def _apply_changes(self, stream):
+        """Apply every change currently available on the stream, batch by batch."""
+        applied = 0
+        while True:
+            users, events, orders = {}, {}, {}
+            deleted = {"users": set(), "events": set(), "orders": set()}
 
-                event_id = b["renginys_id"]
-                kaina = self.convert_price(b["Kaina"])
-                kiekis = b.get("Kiekis", 1)
-                tipas = b.get("Bilieto_tipas_id")
+            batch = []
+            while len(batch) < self.batch_size:
+                change = stream.try_next()
+                if change is None:
+                    break
+                batch.append(change)
+            if not batch:
+                return applied
 
-                # generate unique relationship ID
-                order_item_id = f"{uzsakymo_id}-{index}"
-
-                # užtikrinam event node
-                self.neo.session.run("MERGE (e:Event {id: $eid})", {"eid": event_id})
-
-                # sukurti relationship su pilna info
-                self.neo.session.run("""
-                    MATCH (u:User {id: $uid})
-                    MATCH (e:Event {id: $eid})
-                    MERGE (u)-[r:BOUGHT {
-                        order_item_id: $order_item_id
-                    }]->(e)
-                    SET r.kiekis = $kiekis,
-                        r.kaina = $kaina,
-                        r.bilieto_tipas = $tipas,
-                        r.uzsakymo_id = $uzsakymo_id,
-                        r.uzsakymo_data = $uzsakymo_data
-                """, {
-                    "uid": user_id,
-                    "eid": event_id,
-                    "order_item_id": order_item_id,
-                    "kiekis": kiekis,
-                    "kaina": kaina,
-                    "tipas": tipas,
-                    "uzsakymo_id": uzsakymo_id,
-                    "uzsakymo_data": uzsakymo_data
-                })
+            for change in batch:
+                coll = change["ns"]["coll"]
+                doc_id = change["documentKey"]["_id"]
+                doc = change.get("fullDocument")
 
+                if coll == self.mongo.vartotojai.name:
+                    target, dels, key = users, deleted["users"], doc_id
+                elif coll == self.mongo.renginiai.name:
+                    target, dels, key = events, deleted["events"], doc_id
+                else:
+                    target, dels, key = orders, deleted["orders"], str(doc_id)
+
+                if change["operationType"] == "delete" or doc is None:
+                    target.pop(key, None)
+                    dels.add(key)
+                else:
+                    dels.discard(key)
+                    target[key] = doc
+
+            # CO_BOUGHT perskaičiuojam tik renginiams, kurių BOUGHT ryšiai keitėsi
+            touched = set()
+            for cypher, ids in ((DELETE_USERS_CYPHER, deleted["users"]),
+                                (DELETE_EVENTS_CYPHER, deleted["events"]),
+                                (DELETE_ORDERS_CYPHER, deleted["orders"])):
+                if ids:
+                    touched.update(r["event_id"] for r in self.neo.write(cypher, {"ids": list(ids)}))
+            self.write_users([self.user_row(u) for u in users.values()])
+            self.write_events([self.event_row(e) for e in events.values()])
+
+            order_rows = {key: self.order_rows(o) for key, o in orders.items()}
+            if order_rows:
+                pruned = self.neo.write(PRUNE_ORDER_ITEMS_CYPHER, {"orders": [
+                    {"id": key, "items": [row["order_item_id"] for row in rows]}
+                    for key, rows in order_rows.items()
+                ]})
+                touched.update(r["event_id"] for r in pruned)
+            rows = [row for rows in order_rows.values() for row in rows]
+            self.write_orders(rows)
+            touched.update(row["eid"] for row in rows)
+            self.neo.refresh_co_purchases(touched)
+
+            # watermark'ą išsaugom tik pritaikę visą batch'ą
+            self.save_resume_token(stream.resume_token)
+            applied += len(batch)
+
+    def sync(self, follow=False, interval=1.0):
+        """
+        Incremental Mongo -> Neo4j sync: apply only what changed since the
+        stored resume token. Without a token (or if it fell off the oplog)
+        everything is upserted once and a fresh token is stored.
+
+        With follow=True the change stream stays open and new changes are
+        applied every `interval` seconds. Run it as a single process
+        (CLI: --follow); several followers would apply the same changes twice.
+        """
+        print("Neo4j sync started")
+        token = self.load_resume_token()
+        try:
+            if token is None:
+                raise LookupError("no resume token")
+            with self._watch(token) as stream:
+                applied = self._apply_changes(stream)
+                print(f"Neo4j sync complete: {applied} changes applied")
+                self._follow(stream, follow, interval)
+        except (LookupError, OperationFailure) as e:
+            print(f"Neo4j sync falling back to full upsert ({e})")
+            # stream'ą atidarom prieš importą, kad nepraleistume tuo metu vykusių pakeitimų
+            with self._watch() as stream:
+                start_token = stream.resume_token
+                self.import_all()
+                self.save_resume_token(start_token)
+                self._apply_changes(stream)
+                self.neo.rebuild_co_purchases()
+                print("Neo4j sync complete (full upsert)")
+                self._follow(stream, follow, interval)
+
+    def _follow(self, stream, follow, interval):
+        while follow:
+            time.sleep(interval)
+            applied = self._apply_changes(stream)
+            if applied:
+                print(f"Neo4j sync: {applied} changes applied")
 
     def run(self):
+        """Full rebuild: wipe the graph and re-import everything (CLI: --full)."""
         print("Import started")
-        # vietoj senos self.neo.session.run(...)
-        self.neo._run_query("MATCH (n) DETACH DELETE n")  # visada išvalome grafą
-        self.import_users()
-        self.import_events()
-        self.import_orders()
-        print("Import complete!")
\ No newline at end of file
+        with self._watch() as stream:
+            start_token = stream.resume_token
+            # trinam dalimis, kad didelis grafas netilptų į vieną transakciją
+            self.neo._run_query("""
+                MATCH (n)
+                CALL { WITH n DETACH DELETE n } IN TRANSACTIONS OF 10000 ROWS
+            """)
+            self.import_all()
+            self.save_resume_token(start_token)
+        self.neo.rebuild_co_purchases()
+        print("Import complete!")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mongo -> Neo4j sync")
+    parser.add_argument("--full", action="store_true",
+                        help="wipe the graph and re-import everything")
+    parser.add_argument("--rebuild-co-bought", action="store_true",
+                        help="only recompute CO_BOUGHT weights (run periodically, e.g. from cron)")
+    parser.add_argument("--normalize-dates", action="store_true",
+                        help="one-off: convert string Event.data values to native datetimes")
+    parser.add_argument("--follow", action="store_true",
+                        help="keep the change stream open and apply changes as they arrive")
+    parser.add_argument("--interval", type=float, default=1.0,
+                        help="seconds between change stream polls with --follow")
+    parser.add_argument("--batch-size", type=int, default=1000)
+    args = parser.parse_args()
+
+    importer = MongoToNeoImporter(batch_size=args.batch_size)
+    importer.neo.ensure_schema()
+    if args.normalize_dates:
+        print(f"Converted {importer.neo.normalize_event_dates()} Event.data values")
+    elif args.rebuild_co_bought:
+        importer.neo.rebuild_co_purchases()
+    elif args.full:
+        importer.run()
+    else:
+        importer.sync(follow=args.follow, interval=args.interval)
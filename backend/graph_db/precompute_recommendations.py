@@ -0,0 +1,64 @@
+from backend.graph_db.graph import GraphDB
+from backend.redysas.ops import RedisClient
+from backend.app.config import REDIS_CODEC, REDIS_COMPRESS_THRESHOLD, RECO_CACHE_TTL, reco_key
+import argparse
+import json
+
+
+def chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+
+def precompute(neo, user_ids, batch_size=500, limit=10):
+    """Yield {user_id: [events]} per chunk using GraphDB.recommend_collaborative_batch."""
+    for chunk in chunks(user_ids, batch_size):
+        yield neo.recommend_collaborative_batch(chunk, limit=limit, batch_size=batch_size)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute collaborative recommendations for many users (campaigns)"
+    )
+    parser.add_argument("--out", help="write JSONL to this file instead of Redis")
+    parser.add_argument("--users-file", help="file with one user id per line (default: all buyers)")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--limit", type=int, default=10)
+    parser.add_argument("--ttl", type=int, default=RECO_CACHE_TTL,
+                        help="Redis TTL in seconds (same key as /recommendations/<user_id>)")
+    args = parser.parse_args()
+
+    neo = GraphDB()
+    if args.users_file:
+        with open(args.users_file, encoding="utf-8") as f:
+            user_ids = [line.strip() for line in f if line.strip()]
+    else:
+        user_ids = neo.users_with_purchases()
+    print(f"Precomputing recommendations for {len(user_ids)} users")
+
+    # vartotojai be istorijos praleidžiami: jiems route'as grąžina cold-start sąrašą
+    done = skipped = 0
+    if args.out:
+        with open(args.out, "w", encoding="utf-8") as f:
+            for batch in precompute(neo, user_ids, args.batch_size, args.limit):
+                for user_id, recs in batch.items():
+                    if recs is None:
+                        skipped += 1
+                        continue
+                    f.write(json.dumps({"user_id": user_id, "recommendations": recs},
+                                       ensure_ascii=False, default=str) + "\n")
+                done += len(batch)
+                print(f"  {done}/{len(user_ids)}")
+    else:
+        redis = RedisClient(codec=REDIS_CODEC, compress_threshold=REDIS_COMPRESS_THRESHOLD)
+        for batch in precompute(neo, user_ids, args.batch_size, args.limit):
+            redis.set_many(
+                {reco_key(u, "all"): recs for u, recs in batch.items() if recs is not None},
+                ttl=args.ttl,
+            )
+            skipped += sum(recs is None for recs in batch.values())
+            done += len(batch)
+            print(f"  {done}/{len(user_ids)}")
+
+    neo.close()
+    print(f"Precompute complete! Skipped {skipped} users without purchase history")
@@ -0,0 +1,218 @@
+"""
+In-process collaborative recommender over a sparse user x event purchase matrix.
+
+Same interface as GraphDB.recommend_collaborative / recommend_collaborative_upcoming
+(None = no purchase history, otherwise a list of event dicts), selected with
+RECO_ENGINE = "sparse". BOUGHT pairs are loaded from Mongo `Užsakymai`; the
+item-item co-occurrence matrix C = AᵀA holds the same weights as the
+CO_BOUGHT edges (number of distinct users who bought both events).
+
+The matrix is rebuilt in a background thread every `refresh_interval` seconds,
+so results lag purchases by up to that long; until the first build finishes,
+queries go to the `fallback` engine (GraphDB).
+"""
+import atexit
+import json
+import threading
+import time
+from datetime import datetime, timezone
+
+from dateutil.relativedelta import relativedelta
+
+try:
+    import numpy as np
+    from scipy.sparse import csr_matrix
+except ImportError:  # pasirenkama priklausomybė
+    np = csr_matrix = None
+
+
+def available():
+    return csr_matrix is not None
+
+
+def _timestamp(value):
+    """Renginio Data (datetime / ISO string / {"$date": ...}) -> UTC timestamp or nan."""
+    if isinstance(value, dict):
+        value = value.get("$date")
+    if isinstance(value, str):
+        try:
+            value = datetime.fromisoformat(value.replace("Z", "+00:00"))
+        except ValueError:
+            return float("nan")
+    if not isinstance(value, datetime):
+        return float("nan")
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _event_dict(e):
+    """Mongo renginys -> the same keys GraphDB returns (graph.EVENT_PROJECTION)."""
+    bilietu_tipai = [
+        {
+            "Bilieto_tipas_id": b.get("Bilieto_tipas_id"),
+            "Kaina": float(str(b.get("Kaina", 0))),
+            "Likutis": int(b.get("Likutis", 0)),
+        }
+        for b in e.get("Bilieto_tipas", [])
+    ]
+    return {
+        "event_id": e["_id"],
+        "event_date": e.get("Data"),
+        "title": e.get("Pavadinimas", ""),
+        "type": e.get("Tipas", ""),
+        "address": e.get("Adresas", ""),
+        "city": e.get("Miestas", ""),
+        "venue": e.get("Vieta", ""),
+        "age_restriction": e.get("Amziaus_cenzas"),
+        "duration": e.get("Renginio_trukme"),
+        "ticket_types": json.dumps(bilietu_tipai),
+        "organizers": json.dumps(e.get("Organizatorius", []), default=str),
+    }
+
+
+class _Model:
+    """Immutable snapshot; refresh() builds a new one and swaps the reference."""
+
+    def __init__(self, user_index, event_ids, purchases, co_counts, event_ts, events):
+        self.user_index = user_index    # user_id -> row
+        self.event_ids = event_ids      # column -> event_id
+        self.purchases = purchases      # A: users x events (CSR, 0/1)
+        self.co_counts = co_counts      # C = AᵀA be įstrižainės (CSR)
+        self.event_ts = event_ts        # column -> UTC timestamp (nan = nežinoma)
+        self.events = events            # event_id -> dict
+
+
+class SparseRecommender:
+    def __init__(self, db, refresh_interval=300, fallback=None):
+        if not available():
+            raise ImportError("SparseRecommender requires numpy and scipy")
+        self.db = db
+        self.refresh_interval = refresh_interval
+        self.fallback = fallback
+        self._model = None
+        self._stop = threading.Event()
+        self._thread = None
+
+    # -------------------------
+    # Loading
+    # -------------------------
+    def load_purchases(self):
+        """Distinct (user_id, event_id) pairs from `Užsakymai`."""
+        pipeline = [
+            {"$unwind": "$Bilietai"},
+            {"$group": {"_id": {"u": "$vartotojo_id", "e": "$Bilietai.renginys_id"}}},
+        ]
+        return [
+            (doc["_id"]["u"], doc["_id"]["e"])
+            for doc in self.db.uzsakymai.aggregate(pipeline, allowDiskUse=True)
+            if doc["_id"].get("u") is not None and doc["_id"].get("e") is not None
+        ]
+
+    def refresh(self):
+        started = time.perf_counter()
+        pairs = self.load_purchases()
+
+        user_index, event_index = {}, {}
+        rows = np.fromiter((user_index.setdefault(u, len(user_index)) for u, _ in pairs),
+                           dtype=np.int32, count=len(pairs))
+        cols = np.fromiter((event_index.setdefault(e, len(event_index)) for _, e in pairs),
+                           dtype=np.int32, count=len(pairs))
+        event_ids = list(event_index)
+
+        purchases = csr_matrix(
+            (np.ones(len(pairs), dtype=np.float32), (rows, cols)),
+            shape=(len(user_index), len(event_ids)),
+        )
+        co_counts = (purchases.T @ purchases).tocsr()
+        co_counts.setdiag(0)
+        co_counts.eliminate_zeros()
+
+        events = {
+            e["_id"]: _event_dict(e)
+            for e in self.db.renginiai.find({"_id": {"$in": event_ids}})
+        }
+        event_ts = np.array(
+            [_timestamp(events.get(eid, {}).get("event_date")) for eid in event_ids],
+            dtype=np.float64,
+        )
+
+        self._model = _Model(user_index, event_ids, purchases, co_counts, event_ts, events)
+        print(f"Sparse recommender refreshed: {len(user_index)} users, {len(event_ids)} events, "
+              f"{co_counts.nnz} co-purchase pairs in {time.perf_counter() - started:.2f}s")
+        return self._model
+
+    # -------------------------
+    # Queries
+    # -------------------------
+    def _current(self):
+        """Latest snapshot, None until the first refresh (never rebuilt on the request path)."""
+        return self._model
+
+    def _fallback(self, method, *args):
+        if self.fallback is None:
+            raise RuntimeError("Sparse recommender matrix is not loaded yet")
+        return getattr(self.fallback, method)(*args)
+
+    def _top(self, model, user_id, limit, mask=None):
+        row = model.user_index.get(user_id)
+        if row is None:
+            return None  # istorijos nėra (cold start)
+
+        owned = model.purchases.indices[model.purchases.indptr[row]:model.purchases.indptr[row + 1]]
+        scores = np.asarray(model.co_counts[owned].sum(axis=0)).ravel()
+        scores[owned] = 0
+        if mask is not None:
+            scores[~mask] = 0
+
+        candidates = np.flatnonzero(scores)
+        if len(candidates) > limit:
+            candidates = candidates[np.argpartition(-scores[candidates], limit - 1)[:limit]]
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+
+        return [
+            model.events.get(model.event_ids[i], {"event_id": model.event_ids[i]})
+            for i in candidates
+        ]
+
+    def recommend_collaborative(self, user_id, limit=10):
+        """All recommended events (co-occurrence with the user's purchases)."""
+        model = self._current()
+        if model is None:
+            return self._fallback("recommend_collaborative", user_id, limit)
+        return self._top(model, user_id, limit)
+
+    def recommend_collaborative_upcoming(self, user_id, limit=5, months=24):
+        """Upcoming recommended events only (next `months` months)."""
+        model = self._current()
+        if model is None:
+            return self._fallback("recommend_collaborative_upcoming", user_id, limit, months)
+        now = datetime.now(timezone.utc)
+        ts = model.event_ts
+        with np.errstate(invalid="ignore"):
+            mask = (ts >= now.timestamp()) & (ts <= (now + relativedelta(months=months)).timestamp())
+        return self._top(model, user_id, limit, mask)
+
+    # -------------------------
+    # Periodic refresh
+    # -------------------------
+    def _loop(self):
+        while True:
+            try:
+                self.refresh()
+            except Exception as e:
+                print(f"⚠️ Sparse recommender refresh failed: {e}")
+            if self._stop.wait(self.refresh_interval):
+                return
+
+    def start(self):
+        """Build the matrix in a background thread (first load included) and keep refreshing it."""
+        if self._thread is not None:
+            return self
+        self._thread = threading.Thread(target=self._loop, name="sparse-recommender", daemon=True)
+        self._thread.start()
+        atexit.register(self.stop)
+        return self
+
+    def stop(self):
+        self._stop.set()
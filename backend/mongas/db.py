@@ -1,6 +1,6 @@
 from pathlib import Path
 import yaml
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING
 import certifi
 
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
@@ -12,6 +12,8 @@ class MongoDB():
         self.vartotojai = self.db["Vartotojai"]
         self.renginiai = self.db["Renginiai"]
         self.uzsakymai = self.db["Užsakymai"] 
+        self.outbox = self.db["Outbox"]
+        self.ensure_indexes()
         print("✅ Connected to MongoDB database")
 
     def connect(self):
@@ -23,6 +25,18 @@ class MongoDB():
 
         return self.client
 
+    def ensure_indexes(self):
+        """Create indexes used by hot queries (idempotent)."""
+        # "valid events" filtras: Data > now ir Bilieto_tipas.Likutis > 0
+        self.renginiai.create_index([("Data", ASCENDING)], name="data_1")
+        self.renginiai.create_index(
+            [("Bilieto_tipas.Likutis", ASCENDING)], name="bilieto_tipas_likutis_1"
+        )
+        # Outbox worker'is ima "pending" užduotis pagal next_attempt_at
+        self.outbox.create_index(
+            [("status", ASCENDING), ("next_attempt_at", ASCENDING)], name="status_next_attempt_1"
+        )
+
 
 
 
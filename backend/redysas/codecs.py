@@ -0,0 +1,207 @@
+"""
+Cache value codecs for RedisClient.
+
+Every encoded value starts with one header byte:
+    0x03 - JSON text (json / orjson), typed values tagged as {"__t": "dt", "v": ...}
+    0x02 - msgpack, typed values stored as ExtType
+    0x01 - older JSON text tagged like Mongo extended JSON ({"$date": ...}); read only
+    | 0x10 - payload is zstd-compressed
+Values written before codecs existed (plain JSON text) have no header and are
+decoded with json.loads, so old keys keep working.
+"""
+import json
+from datetime import date, datetime
+from decimal import Decimal
+
+try:
+    import msgpack
+except ImportError:  # pasirenkama priklausomybė
+    msgpack = None
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+try:
+    from bson import ObjectId
+    from bson.decimal128 import Decimal128
+except ImportError:
+    ObjectId = Decimal128 = None
+
+FMT_JSON_LEGACY = 0x01
+FMT_MSGPACK = 0x02
+FMT_JSON = 0x03
+FLAG_ZSTD = 0x10
+
+# msgpack ExtType kodai
+EXT_DATETIME = 1
+EXT_DATE = 2
+EXT_DECIMAL = 3
+EXT_DECIMAL128 = 4
+EXT_OBJECTID = 5
+
+
+# -------------------------
+# Typed values
+# -------------------------
+# Žymės privačios: "$date" / "$oid" / "$numberDecimal" duomenyse būna ir pažodžiui
+TAG_KEY = "__t"
+VALUE_KEY = "v"
+_FROM_TAG = {
+    "dt": datetime.fromisoformat,
+    "day": date.fromisoformat,
+    "dec": Decimal,
+}
+if ObjectId is not None:
+    _FROM_TAG.update({"d128": Decimal128, "oid": ObjectId})
+
+
+def _tag(obj):
+    """Python value -> JSON-safe tagged dict {"__t": <type>, "v": <string>}."""
+    if isinstance(obj, datetime):
+        return {TAG_KEY: "dt", VALUE_KEY: obj.isoformat()}
+    if isinstance(obj, date):
+        return {TAG_KEY: "day", VALUE_KEY: obj.isoformat()}
+    if isinstance(obj, Decimal):
+        return {TAG_KEY: "dec", VALUE_KEY: str(obj)}
+    if Decimal128 is not None and isinstance(obj, Decimal128):
+        return {TAG_KEY: "d128", VALUE_KEY: str(obj)}
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return {TAG_KEY: "oid", VALUE_KEY: str(obj)}
+    return str(obj)
+
+
+def _untag(d):
+    if len(d) != 2 or d.keys() != {TAG_KEY, VALUE_KEY}:
+        return d
+    convert = _FROM_TAG.get(d[TAG_KEY])
+    if convert is None or not isinstance(d[VALUE_KEY], str):
+        return d
+    try:
+        return convert(d[VALUE_KEY])
+    except Exception:
+        return d
+
+
+def _untag_legacy(d):
+    """FMT_JSON_LEGACY tags; values that do not parse are left as stored."""
+    if len(d) != 1:
+        return d
+    (key, value), = d.items()
+    convert = {
+        "$date": datetime.fromisoformat,
+        "$day": date.fromisoformat,
+        "$decimal": Decimal,
+        "$numberDecimal": Decimal128,
+        "$oid": ObjectId,
+    }.get(key)
+    if convert is None or not isinstance(value, str):
+        return d
+    try:
+        return convert(value)
+    except Exception:
+        return d
+
+
+def _revive(obj, untag=_untag):
+    if isinstance(obj, dict):
+        obj = {k: _revive(v, untag) for k, v in obj.items()}
+        return untag(obj)
+    if isinstance(obj, list):
+        return [_revive(v, untag) for v in obj]
+    return obj
+
+
+def _ext_default(obj):
+    if isinstance(obj, datetime):
+        return msgpack.ExtType(EXT_DATETIME, obj.isoformat().encode())
+    if isinstance(obj, date):
+        return msgpack.ExtType(EXT_DATE, obj.isoformat().encode())
+    if isinstance(obj, Decimal):
+        return msgpack.ExtType(EXT_DECIMAL, str(obj).encode())
+    if Decimal128 is not None and isinstance(obj, Decimal128):
+        return msgpack.ExtType(EXT_DECIMAL128, str(obj).encode())
+    if ObjectId is not None and isinstance(obj, ObjectId):
+        return msgpack.ExtType(EXT_OBJECTID, obj.binary)
+    return str(obj)
+
+
+def _ext_hook(code, data):
+    if code == EXT_DATETIME:
+        return datetime.fromisoformat(data.decode())
+    if code == EXT_DATE:
+        return date.fromisoformat(data.decode())
+    if code == EXT_DECIMAL:
+        return Decimal(data.decode())
+    if code == EXT_DECIMAL128 and Decimal128 is not None:
+        return Decimal128(data.decode())
+    if code == EXT_OBJECTID and ObjectId is not None:
+        return ObjectId(data)
+    return msgpack.ExtType(code, data)
+
+
+# -------------------------
+# Codec
+# -------------------------
+class Codec:
+    """Encode/decode cache values; falls back to json if the chosen library is missing."""
+
+    def __init__(self, name="json", compress_threshold=None):
+        if name == "msgpack" and msgpack is None:
+            print("⚠️ msgpack not installed, falling back to json codec")
+            name = "json"
+        if name == "orjson" and orjson is None:
+            print("⚠️ orjson not installed, falling back to json codec")
+            name = "json"
+        if compress_threshold and zstandard is None:
+            print("⚠️ zstandard not installed, cache compression disabled")
+            compress_threshold = None
+
+        self.name = name
+        self.compress_threshold = compress_threshold
+        self._zc = zstandard.ZstdCompressor(level=3) if compress_threshold else None
+        self._zd = zstandard.ZstdDecompressor() if zstandard is not None else None
+
+    def dumps(self, value) -> bytes:
+        if self.name == "msgpack":
+            fmt = FMT_MSGPACK
+            body = msgpack.packb(value, default=_ext_default, datetime=False)
+        elif self.name == "orjson":
+            fmt = FMT_JSON
+            body = orjson.dumps(
+                value, default=_tag,
+                option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+            )
+        else:
+            fmt = FMT_JSON
+            body = json.dumps(value, default=_tag, ensure_ascii=False).encode()
+
+        if self.compress_threshold and len(body) >= self.compress_threshold:
+            fmt |= FLAG_ZSTD
+            body = self._zc.compress(body)
+        return bytes([fmt]) + body
+
+    def loads(self, raw: bytes):
+        if not raw:
+            return None
+        fmt, body = raw[0], raw[1:]
+        if fmt & ~FLAG_ZSTD not in (FMT_JSON, FMT_JSON_LEGACY, FMT_MSGPACK):
+            # senas formatas: grynas JSON tekstas
+            return json.loads(raw)
+
+        if fmt & FLAG_ZSTD:
+            body = self._zd.decompress(body)
+            fmt &= ~FLAG_ZSTD
+
+        if fmt == FMT_MSGPACK:
+            return msgpack.unpackb(body, ext_hook=_ext_hook, raw=False, strict_map_key=False)
+        untag = _untag if fmt == FMT_JSON else _untag_legacy
+        if orjson is not None:
+            return _revive(orjson.loads(body), untag)
+        return json.loads(body, object_hook=untag)
@@ -1,17 +1,130 @@
 import redis
 import json
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
 from datetime import timedelta
 from pathlib import Path
 import yaml
 
+from backend.redysas.codecs import Codec
+
 PROJECT_ROOT = Path(__file__).resolve().parent.parent.parent
 
+# Lock'ą atlaisvinam tik jei jis vis dar mūsų (token sutampa)
+RELEASE_LOCK_LUA = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Bilietų likučiai Redis'e: hash inventory:<renginio id> {bilieto tipo id: likutis}
+INVENTORY_KEY = "inventory:{}"
+# Dar į Mongo neperkelti pokyčiai: hash {json([renginio id, tipo id]): delta}
+INVENTORY_PENDING_KEY = "inventory:pending"
+# Rezervacijų eilės numeris: hash inventory:seq:<renginio id> {bilieto tipo id: versija}
+INVENTORY_SEQ_KEY = "inventory:seq:{}"
+
+RESERVE_OK = 1
+RESERVE_NOT_ENOUGH = 0
+RESERVE_NOT_SEEDED = -1
+
+# Atominis patikrinimas ir sumažinimas; grąžina {statusas, tipo likutis, viso renginio likutis, versija}.
+# Versija didėja rezervacijų tvarka (max(ankstesnė + 1, dabar µs)), todėl dera ir su time_ns versijomis
+RESERVE_TICKETS_LUA = """
+local left = redis.call('HGET', KEYS[1], ARGV[1])
+if not left then
+    return {-1, 0, 0, 0}
+end
+left = tonumber(left)
+local qty = tonumber(ARGV[2])
+if left < qty then
+    return {0, left, 0, 0}
+end
+left = redis.call('HINCRBY', KEYS[1], ARGV[1], -qty)
+redis.call('HINCRBY', KEYS[2], ARGV[3], -qty)
+local total = 0
+for _, v in ipairs(redis.call('HVALS', KEYS[1])) do
+    total = total + tonumber(v)
+end
+local now = redis.call('TIME')
+local version = math.max(tonumber(redis.call('HGET', KEYS[3], ARGV[1]) or 0) + 1,
+                         tonumber(now[1]) * 1000000 + tonumber(now[2]))
+redis.call('HSET', KEYS[3], ARGV[1], string.format('%d', version))
+return {1, left, total, version}
+"""
+
+# Paimam ir išvalom sukauptus pokyčius vienu atominiu žingsniu
+DRAIN_HASH_LUA = """
+local items = redis.call('HGETALL', KEYS[1])
+redis.call('DEL', KEYS[1])
+return items
+"""
+
+# Pub/sub kanalas, kuriuo worker'iai praneša vieni kitiems apie invalidaciją
+INVALIDATION_CHANNEL = "cache:invalidate"
+
+
+class LocalCache:
+    """Bounded in-process LRU with per-entry TTL (thread-safe)."""
+
+    def __init__(self, maxsize=1024, ttl=5.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            expires_at, value = item
+            if expires_at < time.monotonic():
+                del self._data[key]
+                return None
+            self._data.move_to_end(key)
+            return value
+
+    def set(self, key, value, ttl=None):
+        ttl = min(ttl, self.ttl) if ttl else self.ttl
+        with self._lock:
+            self._data[key] = (time.monotonic() + ttl, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def pop(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+
 class RedisClient:
-    def __init__(self, ssl=True):
+    def __init__(self, ssl=True, local_cache_size=0, local_cache_ttl=5.0,
+                 codec="json", compress_threshold=None):
         self.host = 'redis-18424.c261.us-east-1-4.ec2.redns.redis-cloud.com'
         self.port = 18424
         self.ssl = ssl
+        self.codec = Codec(codec, compress_threshold)
         self.client = self.connect()
+        self._release_lock = self.client.register_script(RELEASE_LOCK_LUA)
+        self._reserve_tickets = self.client.register_script(RESERVE_TICKETS_LUA)
+        self._drain_hash = self.client.register_script(DRAIN_HASH_LUA)
+
+        # Pasirenkamas L1 cache kiekviename worker'yje (0 = išjungta)
+        # Invalidacijų klausytojas paleidžiamas tingiai (_local), kad veiktų ir po gunicorn/uwsgi fork
+        self.local = None
+        self._listener_pid = None
+        self._listener_lock = threading.Lock()
+        if local_cache_size:
+            self.local = LocalCache(local_cache_size, local_cache_ttl)
         print("✅ Connected to Redis server")
 
     def connect(self):
@@ -26,35 +139,282 @@ class RedisClient:
             password=creds['password'],
         )
 
+        # Cache reikšmės gali būti binarinės (msgpack/zstd), todėl atskiras klientas be dekodavimo
+        self.raw_client = redis.Redis(
+            host=self.host,
+            port=self.port,
+            decode_responses=False,
+            password=creds['password'],
+        )
+
         return self.client
     
+    def _local(self):
+        """
+        Local cache of this process, or None if disabled.
+
+        Threads do not survive fork(), so the pub/sub listener is started on first
+        use in every process (PID check); entries inherited from the parent are dropped.
+        """
+        if self.local is None:
+            return None
+        if self._listener_pid != os.getpid():
+            with self._listener_lock:
+                if self._listener_pid != os.getpid():
+                    self.local.clear()
+                    self._subscribe_invalidations()
+                    self._listener_pid = os.getpid()
+        return self.local
+
+    def _subscribe_invalidations(self):
+        """Evict local entries when another process publishes an invalidation."""
+        # Žinutė: "<origin>|<key>"; savo žinučių nepaisom (lokalų cache jau atnaujinom)
+        self._origin = uuid.uuid4().hex
+
+        def on_message(message):
+            origin, _, key = message["data"].partition("|")
+            if origin != self._origin:
+                self.local.pop(key)
+
+        self._pubsub = self.client.pubsub(ignore_subscribe_messages=True)
+        self._pubsub.subscribe(**{INVALIDATION_CHANNEL: on_message})
+        self._pubsub_thread = self._pubsub.run_in_thread(sleep_time=1.0, daemon=True)
+
+    def _publish_invalidation(self, pipe, key):
+        pipe.publish(INVALIDATION_CHANNEL, f"{self._origin}|{key}")
+
     def set_cache(self, key, value, ttl=None):
-        """Save Python object (dict, list) to Redis as JSON with optional TTL."""
+        """
+        Save Python object (dict, list) to Redis with the configured codec and optional TTL.
+        With a local cache, other processes are told to drop their copy of the key.
+        """
         try:
-            value_json = json.dumps(value, default=str)
+            payload = self.codec.dumps(value)
+            local = self._local()
+            pipe = self.raw_client.pipeline(transaction=False)
             if ttl:
-                self.client.setex(key, timedelta(seconds=ttl), value_json)
+                pipe.setex(key, timedelta(seconds=ttl), payload)
             else:
-                self.client.set(key, value_json)
+                pipe.set(key, payload)
+            if local is not None:
+                self._publish_invalidation(pipe, key)
+            pipe.execute()
+            if local is not None:
+                local.set(key, payload, ttl)
         except Exception as e:
             print(f"Redis set_cache error: {e}")
 
+    def set_many(self, items, ttl=None):
+        """Save many {key: object} pairs in one pipelined round trip (optional TTL)."""
+        if not items:
+            return
+        try:
+            local = self._local()
+            pipe = self.raw_client.pipeline(transaction=False)
+            payloads = {}
+            for key, value in items.items():
+                payloads[key] = payload = self.codec.dumps(value)
+                if ttl:
+                    pipe.setex(key, timedelta(seconds=ttl), payload)
+                else:
+                    pipe.set(key, payload)
+                if local is not None:
+                    self._publish_invalidation(pipe, key)
+            pipe.execute()
+            if local is not None:
+                for key, payload in payloads.items():
+                    local.set(key, payload, ttl)
+        except Exception as e:
+            print(f"Redis set_many error: {e}")
+
+    def replace_sorted_set(self, key, mapping):
+        """
+        Atomically replace a sorted set with {member: score} (one MULTI round trip).
+        A `<key>:built` marker is written too: Redis drops empty sorted sets, so the
+        marker is what tells zrange_from that an empty result is still cached.
+        """
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.delete(key)
+            if mapping:
+                pipe.zadd(key, mapping)
+            pipe.set(f"{key}:built", 1)
+            pipe.execute()
+        except Exception as e:
+            print(f"Redis replace_sorted_set error: {e}")
+
+    def zrange_from(self, key, min_score):
+        """
+        Drop members scored below min_score (O(log n) per removed member) and
+        return the remaining members in score order. Returns None if the set
+        was never built (no `<key>:built` marker); an empty cached set returns [].
+        """
+        try:
+            pipe = self.client.pipeline(transaction=True)
+            pipe.exists(f"{key}:built")
+            pipe.zremrangebyscore(key, "-inf", f"({min_score}")
+            pipe.zrangebyscore(key, min_score, "+inf")
+            built, _, members = pipe.execute()
+            return members if built else None
+        except Exception as e:
+            print(f"Redis zrange_from error: {e}")
+            return None
+
+    def zremove(self, key, *members):
+        """Remove members from a sorted set (O(log n) each)."""
+        try:
+            self.client.zrem(key, *members)
+        except Exception as e:
+            print(f"Redis zremove error: {e}")
+
     def get_cache(self, key):
-        """Retrieve JSON value from Redis."""
+        """Retrieve a cached value from the local LRU (if enabled) or Redis."""
         try:
-            value = self.client.get(key)
-            return json.loads(value) if value else None
+            local = self._local()
+            value = local.get(key) if local is not None else None
+            if value is None:
+                value = self.raw_client.get(key)
+                if value and local is not None:
+                    local.set(key, value)
+            # Saugom užkoduotus baitus, kad kviečiantysis negalėtų pakeisti cache'o objekto
+            return self.codec.loads(value) if value else None
         except Exception as e:
             print(f"Redis get_cache error: {e}")
             return None
 
+    def cache_aside(self, key, loader, ttl=None, lock_ttl=10, wait_timeout=5.0, stale_ttl=None):
+        """
+        Single-flight cache-aside read. Returns (value, from_cache).
+
+        On a miss only the worker holding `lock:<key>` runs loader(); the others
+        get the last good value from `stale:<key>` (kept only for keys with a TTL)
+        or poll for the fresh one until wait_timeout. None results are not cached.
+        """
+        cached = self.get_cache(key)
+        if cached is not None:
+            return cached, True
+
+        lock_key = f"lock:{key}"
+        stale_key = f"stale:{key}"
+        token = uuid.uuid4().hex
+        try:
+            acquired = self.client.set(lock_key, token, nx=True, ex=lock_ttl)
+        except Exception as e:
+            print(f"Redis lock error: {e}")
+            acquired = True  # Redis nepasiekiamas - skaičiuojam patys
+
+        if acquired:
+            try:
+                value = loader()
+                if value is not None:
+                    self.set_cache(key, value, ttl)
+                    if ttl:
+                        self.set_cache(stale_key, value, stale_ttl or ttl * 10)
+                return value, False
+            finally:
+                try:
+                    self._release_lock(keys=[lock_key], args=[token])
+                except Exception as e:
+                    print(f"Redis unlock error: {e}")
+
+        if ttl:
+            stale = self.get_cache(stale_key)
+            if stale is not None:
+                return stale, True
+
+        deadline = time.monotonic() + wait_timeout
+        while time.monotonic() < deadline:
+            time.sleep(0.05)
+            cached = self.get_cache(key)
+            if cached is not None:
+                return cached, True
+            try:
+                if not self.client.exists(lock_key):
+                    break  # lock'o savininkas baigė, bet nieko neįrašė
+            except Exception:
+                break
+
+        return loader(), False
+
     def invalidate_cache(self, key):
-        """Delete cache key."""
+        """Delete cache key and evict it from every worker's local cache."""
         try:
-            self.client.delete(key)
+            local = self._local()
+            if local is not None:
+                local.pop(key)
+                pipe = self.client.pipeline(transaction=False)
+                pipe.delete(key)
+                self._publish_invalidation(pipe, key)
+                pipe.execute()
+            else:
+                self.client.delete(key)
         except Exception as e:
             print(f"Redis invalidate error: {e}")
 
+    def invalidate_many(self, keys):
+        """Delete several cache keys in one round trip (and evict them from every local cache)."""
+        keys = list(keys)
+        if not keys:
+            return
+        try:
+            local = self._local()
+            pipe = self.client.pipeline(transaction=False)
+            pipe.delete(*keys)
+            if local is not None:
+                for key in keys:
+                    local.pop(key)
+                    self._publish_invalidation(pipe, key)
+            pipe.execute()
+        except Exception as e:
+            print(f"Redis invalidate_many error: {e}")
+
+    # -------------------------
+    # Ticket inventory (INVENTORY_MODE = "redis")
+    # -------------------------
+    def seed_inventory(self, event_id, likuciai):
+        """Load {ticket type id: remaining} for an event; existing counters are kept (HSETNX)."""
+        key = INVENTORY_KEY.format(event_id)
+        pipe = self.client.pipeline(transaction=True)
+        for ticket_type_id, likutis in likuciai.items():
+            pipe.hsetnx(key, ticket_type_id, int(likutis))
+        pipe.execute()
+
+    def reserve_tickets(self, event_id, ticket_type_id, qty):
+        """
+        Atomically check and decrement a ticket counter.
+        Returns (status, remaining for the type, remaining for the whole event, version).
+        version orders reservations of one ticket type (in ns, comparable with time.time_ns()).
+        """
+        field = json.dumps([event_id, ticket_type_id])
+        status, left, total, version = self._reserve_tickets(
+            keys=[INVENTORY_KEY.format(event_id), INVENTORY_PENDING_KEY, INVENTORY_SEQ_KEY.format(event_id)],
+            args=[ticket_type_id, qty, field],
+        )
+        return int(status), int(left), int(total), int(version) * 1000
+
+    def release_tickets(self, event_id, ticket_type_id, qty):
+        """Give back a reservation (e.g. when the order insert failed)."""
+        pipe = self.client.pipeline(transaction=True)
+        pipe.hincrby(INVENTORY_KEY.format(event_id), ticket_type_id, qty)
+        pipe.hincrby(INVENTORY_PENDING_KEY, json.dumps([event_id, ticket_type_id]), qty)
+        pipe.execute()
+
+    def drain_inventory_deltas(self):
+        """Take all pending deltas: {(event_id, ticket_type_id): delta}."""
+        items = self._drain_hash(keys=[INVENTORY_PENDING_KEY])
+        deltas = {}
+        for field, delta in zip(items[::2], items[1::2]):
+            event_id, ticket_type_id = json.loads(field)
+            deltas[(event_id, ticket_type_id)] = int(delta)
+        return deltas
+
+    def restore_inventory_deltas(self, deltas):
+        """Put drained deltas back (used when applying them to Mongo failed)."""
+        pipe = self.client.pipeline(transaction=False)
+        for (event_id, ticket_type_id), delta in deltas.items():
+            pipe.hincrby(INVENTORY_PENDING_KEY, json.dumps([event_id, ticket_type_id]), delta)
+        pipe.execute()
+
 # Example usage
 if __name__ == "__main__":
     red = RedisClient()
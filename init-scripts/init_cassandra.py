@@ -89,6 +89,71 @@ def create_keyspace_and_tables():
         ) WITH CLUSTERING ORDER BY (answer_id ASC);
     """)
 
+    # ---- v2: klasterizuota pagal created_at (timeuuid) DESC, naujausi pirmi ----
+    # Senos lentelės paliekamos, kad init-scripts/migrate_questions_v2.py galėtų jas perkelti
+
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS questions_by_event_v2 (
+            event_id TEXT,
+            created_at TIMEUUID,
+            question_id UUID,
+            question_date DATE,
+            user_id TEXT,
+            question_text TEXT,
+            PRIMARY KEY ((event_id), created_at)
+        ) WITH CLUSTERING ORDER BY (created_at DESC);
+    """)
+
+    # Dienos particija skaidoma į bucket'us (question_id.int % 8), kad nebūtų vienos "karštos" particijos
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS questions_by_date_v2 (
+            question_date DATE,
+            bucket INT,
+            created_at TIMEUUID,
+            question_id UUID,
+            event_id TEXT,
+            user_id TEXT,
+            question_text TEXT,
+            PRIMARY KEY ((question_date, bucket), created_at)
+        ) WITH CLUSTERING ORDER BY (created_at DESC);
+    """)
+
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS questions_by_event_and_date_v2 (
+            event_id TEXT,
+            question_date DATE,
+            created_at TIMEUUID,
+            question_id UUID,
+            user_id TEXT,
+            question_text TEXT,
+            PRIMARY KEY ((event_id, question_date), created_at)
+        ) WITH CLUSTERING ORDER BY (created_at DESC);
+    """)
+
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS answers_by_question_v2 (
+            question_id UUID,
+            created_at TIMEUUID,
+            answer_id UUID,
+            answer_date DATE,
+            user_id TEXT,
+            answer_text TEXT,
+            PRIMARY KEY ((question_id), created_at)
+        ) WITH CLUSTERING ORDER BY (created_at DESC);
+    """)
+
+    session.execute("""
+        CREATE TABLE IF NOT EXISTS answers_by_question_and_date_v2 (
+            question_id UUID,
+            answer_date DATE,
+            created_at TIMEUUID,
+            answer_id UUID,
+            user_id TEXT,
+            answer_text TEXT,
+            PRIMARY KEY ((question_id, answer_date), created_at)
+        ) WITH CLUSTERING ORDER BY (created_at DESC);
+    """)
+
     print("Keyspace ir lentelės sėkmingai sukurtos Cassandra duomenų bazėje.")
     cluster.shutdown()
 
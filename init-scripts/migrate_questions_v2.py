@@ -0,0 +1,110 @@
+from cassandra.cluster import Cluster
+from cassandra.concurrent import execute_concurrent_with_args
+from cassandra.query import SimpleStatement
+from cassandra.util import uuid_from_time
+from datetime import datetime, time, timezone
+
+KEYSPACE = "event_app"
+QUESTION_BUCKETS = 8   # turi sutapti su backend/casa/kasandre.py
+CONCURRENCY = 64
+FETCH_SIZE = 1000
+
+# Vienkartinis perkėlimas: senos lentelės -> *_v2 (created_at TIMEUUID, DESC).
+# Senose lentelėse laiko nėra, todėl created_at gaunamas iš datos + deterministinio
+# poslinkio pagal id - paleidus kelis kartus įrašomos tos pačios eilutės (idempotentiška).
+
+
+def created_at_for(row_id, day):
+    """Deterministic timeuuid inside `day` for a legacy row (no created_at in old tables)."""
+    if hasattr(day, "date"):
+        day = day.date()  # cassandra.util.Date -> datetime.date
+    midnight = datetime.combine(day, time.min, tzinfo=timezone.utc).timestamp()
+    offset = (row_id.int % 86_400_000_000) / 1_000_000  # < 1 diena, mikrosekundėmis
+    return uuid_from_time(
+        midnight + offset,
+        node=row_id.int & 0xFFFFFFFFFFFF,
+        clock_seq=(row_id.int >> 48) & 0x3FFF,
+    )
+
+
+def copy(session, select_cql, insert_cqls, to_params):
+    """Stream `select_cql` page by page and write every row to all `insert_cqls` concurrently."""
+    inserts = [session.prepare(cql) for cql in insert_cqls]
+    rows = session.execute(SimpleStatement(select_cql, fetch_size=FETCH_SIZE))
+    total = 0
+    while True:
+        page = rows.current_rows
+        for stmt, make_params in zip(inserts, to_params):
+            execute_concurrent_with_args(
+                session, stmt, [make_params(r) for r in page], concurrency=CONCURRENCY
+            )
+        total += len(page)
+        if not rows.has_more_pages:
+            break
+        rows.fetch_next_page()
+    return total
+
+
+def main():
+    cluster = Cluster(['localhost'], port=9042)
+    session = cluster.connect()
+    session.set_keyspace(KEYSPACE)
+
+    # ------------------------------
+    #  QUESTIONS (questions_all turi visus laukus)
+    # ------------------------------
+    def q_created(r):
+        return created_at_for(r.question_id, r.question_date)
+
+    n = copy(
+        session,
+        "SELECT question_id, question_date, event_id, user_id, question_text FROM questions_all",
+        [
+            """INSERT INTO questions_by_event_v2
+               (event_id, created_at, question_id, question_date, user_id, question_text)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            """INSERT INTO questions_by_date_v2
+               (question_date, bucket, created_at, question_id, event_id, user_id, question_text)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            """INSERT INTO questions_by_event_and_date_v2
+               (event_id, question_date, created_at, question_id, user_id, question_text)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+        ],
+        [
+            lambda r: (r.event_id, q_created(r), r.question_id, r.question_date, r.user_id, r.question_text),
+            lambda r: (r.question_date, r.question_id.int % QUESTION_BUCKETS, q_created(r),
+                       r.question_id, r.event_id, r.user_id, r.question_text),
+            lambda r: (r.event_id, r.question_date, q_created(r), r.question_id, r.user_id, r.question_text),
+        ],
+    )
+    print(f"✅ Questions migrated: {n}")
+
+    # ------------------------------
+    #  ANSWERS
+    # ------------------------------
+    def a_created(r):
+        return created_at_for(r.answer_id, r.answer_date)
+
+    n = copy(
+        session,
+        "SELECT question_id, answer_date, answer_id, user_id, answer_text FROM answers_by_question",
+        [
+            """INSERT INTO answers_by_question_v2
+               (question_id, created_at, answer_id, answer_date, user_id, answer_text)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+            """INSERT INTO answers_by_question_and_date_v2
+               (question_id, answer_date, created_at, answer_id, user_id, answer_text)
+               VALUES (?, ?, ?, ?, ?, ?)""",
+        ],
+        [
+            lambda r: (r.question_id, a_created(r), r.answer_id, r.answer_date, r.user_id, r.answer_text),
+            lambda r: (r.question_id, r.answer_date, a_created(r), r.answer_id, r.user_id, r.answer_text),
+        ],
+    )
+    print(f"✅ Answers migrated: {n}")
+
+    cluster.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,11 @@
 import pandas as pd
 from cassandra.cluster import Cluster
-from uuid import uuid4
+from uuid import uuid1, uuid4
 from datetime import date
 
 KEYSPACE = "event_app"
 EXCEL_FILE = "Cassandrai.xlsx"   # <- CHANGE to your filename
+QUESTION_BUCKETS = 8             # turi sutapti su backend/casa/kasandre.py
 
 def main():
     # Connect to Cassandra
@@ -27,6 +28,8 @@ def main():
         user_id  = row["user_id"]
         q_text   = row["question"]
         q_uuid   = uuid4()                         # Cassandra PK
+        created  = uuid1()                         # timeuuid (rikiavimas)
+        bucket   = q_uuid.int % QUESTION_BUCKETS
 
         question_uuid_map[q_raw_id] = q_uuid
 
@@ -38,23 +41,23 @@ def main():
             VALUES (%s, %s, %s, %s, %s)
         """, (q_uuid, today, event_id, user_id, q_text))
 
-        # Insert into questions_by_event
+        # Insert into questions_by_event_v2
         session.execute("""
-            INSERT INTO questions_by_event (event_id, question_id, question_date, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (event_id, q_uuid, today, user_id, q_text))
+            INSERT INTO questions_by_event_v2 (event_id, created_at, question_id, question_date, user_id, question_text)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (event_id, created, q_uuid, today, user_id, q_text))
 
-        # Insert into questions_by_date
+        # Insert into questions_by_date_v2
         session.execute("""
-            INSERT INTO questions_by_date (question_date, question_id, event_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (today, q_uuid, event_id, user_id, q_text))
+            INSERT INTO questions_by_date_v2 (question_date, bucket, created_at, question_id, event_id, user_id, question_text)
+            VALUES (%s, %s, %s, %s, %s, %s, %s)
+        """, (today, bucket, created, q_uuid, event_id, user_id, q_text))
 
-        # Insert into questions_by_event_and_date
+        # Insert into questions_by_event_and_date_v2
         session.execute("""
-            INSERT INTO questions_by_event_and_date (event_id, question_date, question_id, user_id, question_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (event_id, today, q_uuid, user_id, q_text))
+            INSERT INTO questions_by_event_and_date_v2 (event_id, question_date, created_at, question_id, user_id, question_text)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (event_id, today, created, q_uuid, user_id, q_text))
 
     print("✅ Questions inserted successfully.")
 
@@ -75,18 +78,19 @@ def main():
             continue
 
         a_uuid = uuid4()
+        created = uuid1()
         today = date.today()
 
         session.execute("""
-            INSERT INTO answers_by_question (question_id, answer_date, answer_id, user_id, answer_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (q_uuid, today, a_uuid, user_id, a_text))
+            INSERT INTO answers_by_question_v2 (question_id, created_at, answer_id, answer_date, user_id, answer_text)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (q_uuid, created, a_uuid, today, user_id, a_text))
 
-        # Insert into answers_by_question_and_date
+        # Insert into answers_by_question_and_date_v2
         session.execute("""
-            INSERT INTO answers_by_question_and_date (question_id, answer_date, answer_id, user_id, answer_text)
-            VALUES (%s, %s, %s, %s, %s)
-        """, (q_uuid, today, a_uuid, user_id, a_text))
+            INSERT INTO answers_by_question_and_date_v2 (question_id, answer_date, created_at, answer_id, user_id, answer_text)
+            VALUES (%s, %s, %s, %s, %s, %s)
+        """, (q_uuid, today, created, a_uuid, user_id, a_text))
 
     print("✅ Answers inserted successfully.")
 